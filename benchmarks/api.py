@@ -0,0 +1,63 @@
+import asyncio
+import random
+import time
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, user_email
+from benchmarks.stats import summarize
+
+# Клиент: приложение в том же процессе (ASGI) или запущенный uvicorn по base_url
+def make_client(base_url: str | None = None) -> httpx.AsyncClient:
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=30)
+    from src.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+# Прогон одного сценария: total запросов, concurrency параллельных воркеров
+async def drive(client: httpx.AsyncClient, build_request, total: int, concurrency: int) -> dict:
+    timings: list[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(worker_id)
+        for _ in remaining:
+            method, url, kwargs = build_request(rng, worker_id)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    summary = summarize(timings, time.perf_counter() - start)
+    summary["errors"] = errors
+    return summary
+
+async def _login(client: httpx.AsyncClient, user_index: int) -> str:
+    response = await client.post("/users/login", data={"username": user_email(user_index), "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+# Горячие пути API: каталог, логин, история заказов, оформление заказа
+async def run_api(args) -> dict:
+    async with make_client(args.base_url) as client:
+        tokens = [await _login(client, index) for index in range(min(args.concurrency, args.users))]
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        in_stock = (await client.get("/tea/", params={"in_stock_only": "true", "limit": 100})).json()
+        tea_ids = [tea["id"] for tea in in_stock] or [1]
+
+        scenarios = {
+            "GET /tea/": (lambda rng, w: ("GET", "/tea/", {"params": {"skip": rng.randrange(max(1, args.teas - 20)), "limit": 20}}), args.requests),
+            "GET /tea/{id}": (lambda rng, w: ("GET", f"/tea/{rng.randrange(args.teas) + 1}", {}), args.requests),
+            "POST /users/login": (lambda rng, w: ("POST", "/users/login", {"data": {
+                "username": user_email(rng.randrange(args.users)), "password": BENCH_PASSWORD}}), args.login_requests),
+            "GET /orders/": (lambda rng, w: ("GET", "/orders/", {"params": {"limit": 20}, "headers": headers[w % len(headers)]}), args.requests),
+            "POST /orders/": (lambda rng, w: ("POST", "/orders/", {"headers": headers[w % len(headers)], "json": {
+                "items": [{"tea_id": rng.choice(tea_ids), "quantity": 1} for _ in range(rng.randint(1, 5))]}}), args.requests),
+        }
+        report = {}
+        for name, (build_request, total) in scenarios.items():
+            report[name] = await drive(client, build_request, total, args.concurrency)
+        return report
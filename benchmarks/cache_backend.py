@@ -0,0 +1,108 @@
+import asyncio
+import sys
+from benchmarks.fake_redis import FakeRedisServer
+from src import cache, shared_cache as shared
+from src.shared_cache import MemoryBackend, RedisBackend, RedisError, SharedCache
+
+# Проверка RedisBackend и SharedCache против FakeRedisServer (настоящий Redis не нужен):
+# GET/SET PX/SET NX/MGET/INCR/DEL, ошибка команды, таймаут и возврат к загрузке из БД,
+# общая версия каталога между «воркерами» и счётчики версий бэкенда в памяти
+async def main() -> int:
+    server = await FakeRedisServer().start()
+    backend = RedisBackend(server.url, pool_size=2)
+    failures: list[str] = []
+
+    def check(name: str, condition: bool):
+        print(f"{'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    try:
+        await backend.set("plain", b"value")
+        check("SET / GET", await backend.get("plain") == b"value")
+        check("GET missing", await backend.get("missing") is None)
+
+        await backend.set("short", b"value", ttl=0.05)
+        check("SET PX before expiry", await backend.get("short") == b"value")
+        await asyncio.sleep(0.1)
+        check("SET PX after expiry", await backend.get("short") is None)
+
+        check("SET NX on free key", await backend.add("lock", b"1", ttl=1))
+        check("SET NX on taken key", not await backend.add("lock", b"2", ttl=1))
+        check("SET NX keeps first value", await backend.get("lock") == b"1")
+
+        check("MGET", await backend.mget("plain", "missing", "lock") == [b"value", None, b"1"])
+        check("INCR new key", await backend.incr("counter") == 1)
+        check("INCR existing key", await backend.incr("counter") == 2)
+
+        await backend.delete("plain", "lock")
+        check("DEL", await backend.mget("plain", "lock") == [None, None])
+
+        await backend.set("counter:text", b"abc")
+        try:
+            await backend.incr("counter:text")
+            check("error reply raises RedisError", False)
+        except RedisError:
+            check("error reply raises RedisError", True)
+        check("connection usable after error reply", await backend.get("counter") == b"2")
+
+        # медленный бэкенд: команда обрывается по CACHE_TIMEOUT_MS, кэш идёт в обход
+        server.delay = shared.CACHE_TIMEOUT_MS / 1000 * 2
+        try:
+            await backend.get("counter")
+            check("timeout raises", False)
+        except asyncio.TimeoutError:
+            check("timeout raises", True)
+        shared_cache = SharedCache(backend, prefix="check")
+        loaded = []
+
+        async def loader():
+            loaded.append(1)
+            return b"from-db"
+        value = await shared_cache.get_or_load("key", loader, 60, lambda raw: raw, lambda raw: raw)
+        check("timeout falls back to loader", value == b"from-db" and loaded == [1])
+        check("timeout versions fall back to -1", await shared_cache.versions("catalog") == [-1])
+        check("timeout counted as backend error", shared_cache.errors >= 2)
+        server.delay = 0
+        check("backend recovers after timeout", await backend.get("counter") == b"2")
+
+        # общая версия каталога: изменение чая на другом воркере меняет ключи локальных кэшей
+        worker_b = SharedCache(RedisBackend(server.url), prefix=shared.shared_cache.prefix)
+        previous_backend, shared.shared_cache.backend = shared.shared_cache.backend, RedisBackend(server.url)
+        try:
+            before = await cache.catalog_version()
+            await worker_b.bump("catalog")
+            check("catalog version follows other workers", await cache.catalog_version() == before + 1)
+        finally:
+            await shared.shared_cache.backend.close()
+            shared.shared_cache.backend = previous_backend
+            await worker_b.backend.close()
+    finally:
+        await backend.close()
+        await server.close()
+
+    # бэкенд в памяти: счётчики версий не вытесняют данные и сами истекают без чтений
+    memory = MemoryBackend(maxsize=10, version_ttl=0.2)
+    await memory.set("data", b"value", ttl=60)
+    for user_id in range(50):
+        await memory.incr(f"version:orders:{user_id}")
+    await memory.set("more", b"value", ttl=60)
+    check("memory: version counters do not evict data", await memory.mget("data", "more") == [b"value", b"value"])
+    check("memory: version counters readable", await memory.get("version:orders:7") == b"1")
+    for _ in range(3):
+        await asyncio.sleep(0.1)
+        await memory.get("version:orders:7")  # чтение продлевает жизнь счётчика
+    await memory.incr("version:orders:7")
+    check("memory: read counters are kept", await memory.get("version:orders:7") == b"2")
+    check("memory: idle counters expire", await memory.get("version:orders:8") is None and len(memory._counters) == 1)
+
+    print(f"commands seen by fake server: {sorted(set(server.commands))}")
+    if failures:
+        print(f"FAIL: {len(failures)} checks")
+        return 1
+    print("OK: redis backend")
+    return 0
+
+# python -m benchmarks.cache_backend
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from src.shared_cache import _read_reply
+
+# Небольшой сервер по протоколу Redis (RESP) в памяти для проверки RedisBackend без настоящего Redis.
+# Команды: AUTH, SELECT, PING, GET, SET [NX] [PX ms], MGET, INCR, DEL.
+# delay — задержка перед каждым ответом (проверка таймаута CACHE_TIMEOUT_MS)
+class FakeRedisServer:
+    def __init__(self):
+        self.values: dict[bytes, tuple[float | None, bytes]] = {}
+        self.commands: list[str] = []
+        self.delay = 0.0
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self
+
+    async def close(self):
+        self._server.close()
+        for task in self._clients:
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def _get(self, key: bytes) -> bytes | None:
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def _set(self, key: bytes, value: bytes, options: list[bytes]):
+        options = [option.upper() for option in options]
+        if b"NX" in options and self._get(key) is not None:
+            return None
+        expires_at = None
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+        self.values[key] = (expires_at, value)
+        return "OK"
+
+    def _incr(self, key: bytes):
+        current = self._get(key)
+        try:
+            value = int(current or 0) + 1
+        except ValueError:
+            return RuntimeError("ERR value is not an integer or out of range")
+        self.values[key] = (None, str(value).encode())
+        return value
+
+    def _handle(self, command: list[bytes]):
+        name, args = command[0].upper().decode(), command[1:]
+        self.commands.append(name)
+        if name in ("AUTH", "SELECT", "PING"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "MGET":
+            return [self._get(key) for key in args]
+        if name == "SET":
+            return self._set(args[0], args[1], args[2:])
+        if name == "INCR":
+            return self._incr(args[0])
+        if name == "DEL":
+            return sum(self.values.pop(key, None) is not None for key in args)
+        return RuntimeError(f"ERR unknown command '{name}'")
+
+    @staticmethod
+    def _encode_reply(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if reply == "OK":
+            return b"+OK\r\n"
+        if isinstance(reply, RuntimeError):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        return b"*%d\r\n" % len(reply) + b"".join(FakeRedisServer._encode_reply(item) for item in reply)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while True:
+                try:
+                    command = await _read_reply(reader)  # команда клиента — массив bulk-строк
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                reply = self._handle(command)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(self._encode_reply(reply))
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass  # сервер останавливается или клиент оборвал соединение по таймауту
+        finally:
+            self._clients.discard(task)
+            writer.close()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from sqlalchemy import func, select, text
+from benchmarks.seed import add_seed_arguments, seed, seed_kwargs, user_email
+from benchmarks.stats import summarize
+from src import models
+from src.base import create_missing_indexes, engine
+
+# Индексы из плана (models.py); «до» — без них, «после» — с ними
+PLAN_INDEXES = ["ix_orders_user_id_created_at", "ix_order_items_order_id", "ix_order_items_tea_id"]
+
+# Горячие запросы: вход по email, история заказов, позиции заказа, продажи чая
+def hot_queries(args):
+    return {
+        "user_by_email": lambda rng: select(models.User).filter(models.User.email == user_email(rng.randrange(args.users))),
+        "orders_by_user": lambda rng: (
+            select(models.Order)
+            .filter(models.Order.user_id == rng.randrange(args.users) + 1)
+            .order_by(models.Order.created_at.desc())
+            .limit(10)
+        ),
+        "items_by_order": lambda rng: select(models.OrderItem).filter(models.OrderItem.order_id == rng.randrange(args.orders) + 1),
+        "items_by_tea": lambda rng: (
+            select(func.count()).select_from(models.OrderItem).filter(models.OrderItem.tea_id == rng.randrange(args.teas) + 1)
+        ),
+    }
+
+async def explain(connection, statement) -> list[str]:
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN" if connection.dialect.name == "sqlite" else "EXPLAIN ANALYZE"
+    result = await connection.exec_driver_sql(f"{prefix} {sql}")
+    return [str(row[-1]) for row in result.all()]
+
+async def measure(connection, queries, iterations: int) -> dict:
+    report = {}
+    for name, build in queries.items():
+        rng = random.Random(0)
+        timings = []
+        for _ in range(iterations):
+            statement = build(rng)
+            start = time.perf_counter()
+            (await connection.execute(statement)).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        report[name] = {"plan": await explain(connection, build(random.Random(0))), **summarize(timings)}
+    return report
+
+async def main(args):
+    if not args.skip_seed:
+        await seed(**seed_kwargs(args))
+    queries = hot_queries(args)
+    async with engine.begin() as connection:
+        for name in PLAN_INDEXES:
+            await connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await connection.execute(text("ANALYZE"))
+        before = await measure(connection, queries, args.iterations)
+
+        await connection.run_sync(create_missing_indexes)
+        await connection.execute(text("ANALYZE"))
+        after = await measure(connection, queries, args.iterations)
+
+    for name in queries:
+        print(f"== {name}: p50 {before[name]['p50_ms']} -> {after[name]['p50_ms']} ms, "
+              f"p95 {before[name]['p95_ms']} -> {after[name]['p95_ms']} ms")
+        print("   before: " + " | ".join(before[name]["plan"]))
+        print("   after:  " + " | ".join(after[name]["plan"]))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"before": before, "after": after}, output, indent=2)
+
+# python -m benchmarks.index_plan --orders 1000000 --json index_plan.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query plans and latency before/after the index plan")
+    add_seed_arguments(parser)
+    parser.set_defaults(orders=1_000_000, users=50_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--json", help="write the report to this file")
+    asyncio.run(main(parser.parse_args()))
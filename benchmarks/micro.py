@@ -0,0 +1,52 @@
+import time
+from benchmarks.seed import user_email
+from benchmarks.stats import summarize
+from sqlalchemy.future import select
+from src import crud, models, schemas
+from src.base import AsyncSessionLocal
+from src.cache import catalog_cache
+
+async def _measure(iterations: int, func) -> dict:
+    timings = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        await func(index)
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+# Изолированные замеры crud-функций и сериализации схем
+async def run_micro(args) -> dict:
+    report = {}
+    async with AsyncSessionLocal() as db:
+        async def teas_cold(index):
+            catalog_cache.clear()
+            await crud.get_teas(db, limit=100)
+
+        async def teas_cached(index):
+            await crud.get_teas(db, limit=100)
+
+        async def user_by_email(index):
+            db.expunge_all()
+            await crud.get_user_by_email(db, email=user_email(index % args.users))
+
+        async def orders_by_user(index):
+            db.expunge_all()
+            await crud.get_orders_by_user(db, user_id=index % args.users + 1, limit=20)
+
+        report["crud.get_teas (cold, 100)"] = await _measure(args.iterations, teas_cold)
+        report["crud.get_teas (cached, 100)"] = await _measure(args.iterations, teas_cached)
+        report["crud.get_user_by_email"] = await _measure(args.iterations, user_by_email)
+        report["crud.get_orders_by_user (20)"] = await _measure(args.iterations, orders_by_user)
+
+        teas = (await db.execute(select(models.Tea).limit(100))).scalars().all()
+        orders = await crud.get_orders(db, limit=20)
+
+        async def serialize_teas(index):
+            [schemas.Tea.model_validate(tea).model_dump_json() for tea in teas]
+
+        async def serialize_orders(index):
+            [schemas.Order.model_validate(order).model_dump_json() for order in orders]
+
+        report["schemas.Tea x100"] = await _measure(args.iterations, serialize_teas)
+        report["schemas.Order x20"] = await _measure(args.iterations, serialize_orders)
+    return report
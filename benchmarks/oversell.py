@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import sys
+from sqlalchemy import select, update
+from benchmarks.seed import seed
+from benchmarks.api import _login, make_client
+from src import models
+from src.base import engine
+
+# Проверка отсутствия overselling: много параллельных POST /orders/ за одним чаем с ограниченным остатком.
+# Успешных заказов должно быть ровно столько, на сколько хватило остатка, и остаток не уходит в минус
+async def main(args) -> int:
+    if not args.skip_seed:
+        await seed(users=args.users, teas=1, orders=0)
+    async with engine.begin() as connection:
+        await connection.execute(update(models.Tea).where(models.Tea.id == 1).values(stock=args.stock, in_stock=True))
+
+    async with make_client(args.base_url) as client:
+        tokens = [await _login(client, index) for index in range(args.users)]
+
+        async def buy(index: int) -> int:
+            response = await client.post(
+                "/orders/",
+                json={"items": [{"tea_id": 1, "quantity": args.quantity}]},
+                headers={"Authorization": f"Bearer {tokens[index % len(tokens)]}"},
+            )
+            return response.status_code
+
+        statuses = await asyncio.gather(*(buy(index) for index in range(args.requests)))
+
+    async with engine.connect() as connection:
+        stock = (await connection.execute(select(models.Tea.stock).where(models.Tea.id == 1))).scalar()
+    sold = statuses.count(200) * args.quantity
+    rejected = statuses.count(400)
+    print(f"requests={args.requests} ok={statuses.count(200)} rejected={rejected} "
+          f"other={len(statuses) - statuses.count(200) - rejected} sold={sold} stock_left={stock}")
+
+    expected_sold = min(args.stock // args.quantity, args.requests) * args.quantity
+    if stock < 0 or sold + stock != args.stock or sold != expected_sold:
+        print(f"FAIL: expected sold={expected_sold}, stock_left={args.stock - expected_sold}")
+        return 1
+    print("OK: no oversell")
+    return 0
+
+# python -m benchmarks.oversell --requests 300 --stock 100
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent checkout against limited stock")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--base-url", help="run against a running uvicorn instead of the in-process app")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import sys
+from sqlalchemy import func, select, update
+from benchmarks.seed import seed
+from benchmarks.api import _login, make_client
+from src import models
+from src.base import engine
+
+# Проверка keyset-пагинации заказов: обход всех страниц GET /orders/?cursor= пользователя
+# должен вернуть каждый его заказ ровно один раз и закончиться. Кроме заказов генератора
+# (явный created_at) создаются заказы через API — у них created_at по умолчанию из БД,
+# в пределах одной секунды, так что проверяется и равенство дат (порядок по id)
+async def main(args) -> int:
+    if not args.skip_seed:
+        await seed(users=args.users, teas=args.teas, orders=args.orders)
+    async with engine.begin() as connection:
+        await connection.execute(update(models.Tea).values(stock=None, in_stock=True))
+
+    async with make_client(args.base_url) as client:
+        headers = {"Authorization": f"Bearer {await _login(client, 0)}"}
+        for _ in range(args.new_orders):
+            response = await client.post("/orders/", json={"items": [{"tea_id": 1, "quantity": 1}]}, headers=headers)
+            response.raise_for_status()
+
+        seen: list[int] = []
+        cursor, pages = "", 0
+        while cursor is not None and pages <= args.max_pages:
+            response = await client.get("/orders/", params={"cursor": cursor, "limit": args.limit, "include_items": "false"}, headers=headers)
+            response.raise_for_status()
+            page = response.json()
+            seen.extend(order["id"] for order in page["items"])
+            cursor, pages = page["next_cursor"], pages + 1
+
+    async with engine.connect() as connection:
+        expected = (await connection.execute(
+            select(func.count()).select_from(models.Order).where(models.Order.user_id == 1)
+        )).scalar()
+    duplicates = len(seen) - len(set(seen))
+    print(f"pages={pages} orders={len(seen)} unique={len(set(seen))} expected={expected}")
+    if cursor is not None or duplicates or len(seen) != expected:
+        print(f"FAIL: pagination {'did not finish' if cursor is not None else 'finished'}, duplicates={duplicates}")
+        return 1
+    print("OK: every order exactly once")
+    return 0
+
+# python -m benchmarks.pagination --limit 2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk every keyset page of GET /orders/ and check for duplicates")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--teas", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--new-orders", type=int, default=7)
+    parser.add_argument("--limit", type=int, default=2)
+    parser.add_argument("--max-pages", type=int, default=1000)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--base-url", help="run against a running uvicorn instead of the in-process app")
+    sys.exit(asyncio.run(main(parser.parse_args())))
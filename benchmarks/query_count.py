@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import sys
+from sqlalchemy import func, select
+from benchmarks.seed import seed
+from benchmarks.api import _login, make_client
+from src import crud, models
+from src.base import AsyncSessionLocal
+from src.querycount import assert_max_queries
+
+# Проверка числа round trip'ов на горячих путях заказов (защита от регрессий N+1):
+# страница из limit заказов с позициями и чаем — фиксированное число запросов, не зависящее от limit
+async def main(args) -> int:
+    if not args.skip_seed:
+        await seed(users=args.users, teas=args.teas, orders=args.orders)
+    async with AsyncSessionLocal() as db:
+        user_id, orders = (await db.execute(
+            select(models.Order.user_id, func.count()).group_by(models.Order.user_id)
+            .order_by(func.count().desc()).limit(1)
+        )).one()
+    if orders < args.limit:
+        print(f"FAIL: the busiest user has only {orders} orders, need --orders large enough for --limit {args.limit}")
+        return 1
+
+    failures = []
+
+    async def check(name: str, expected: int, run):
+        try:
+            with assert_max_queries(expected) as counter:
+                loaded = await run()
+            print(f"ok   {name}: {counter.count} queries for {loaded} orders (max {expected})")
+        except AssertionError as exc:
+            print(f"FAIL {name}: {str(exc).splitlines()[0]}")
+            failures.append(name)
+
+    async def in_session(call):
+        async with AsyncSessionLocal() as db:
+            return len(await call(db))
+
+    # страница заказов и одна выборка позиций вместе с чаем (JOIN)
+    await check("get_orders_by_user", 2, lambda: in_session(
+        lambda db: crud.get_orders_by_user(db, user_id=user_id, limit=args.limit)))
+    await check("get_orders_by_user eager=False", 1, lambda: in_session(
+        lambda db: crud.get_orders_by_user(db, user_id=user_id, limit=args.limit, eager=False)))
+    await check("get_orders_by_user_keyset", 2, lambda: in_session(
+        lambda db: crud.get_orders_by_user_keyset(db, user_id=user_id, limit=args.limit)))
+    await check("get_orders (admin)", 2, lambda: in_session(
+        lambda db: crud.get_orders(db, limit=args.limit)))
+
+    # запросы считаются в этом процессе, поэтому API — только приложение в процессе (ASGI)
+    async with make_client() as client:
+        headers = {"Authorization": f"Bearer {await _login(client, user_id - 1)}"}
+
+        async def get_orders(params: dict):
+            response = await client.get("/orders/", params={"limit": args.limit, **params}, headers=headers)
+            response.raise_for_status()
+            body = response.json()
+            return len(body["items"] if isinstance(body, dict) else body)
+
+        # пользователь из токена (промах кэша) + страница заказов + позиции
+        await check("GET /orders/", 3, lambda: get_orders({}))
+        await check("GET /orders/ repeated (shared cache)", 0, lambda: get_orders({}))
+        await check("GET /orders/?cursor=", 2, lambda: get_orders({"cursor": ""}))
+
+    if failures:
+        print(f"FAIL: {len(failures)} checks")
+        return 1
+    print("OK: query counts")
+    return 0
+
+# python -m benchmarks.query_count --limit 100
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assert a fixed number of SQL round trips for order pages")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--teas", type=int, default=50)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,77 @@
+import os
+
+# Основная БД и «реплика» — два локальных файла SQLite; липкость к основной БД сокращена для проверки
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+os.environ.setdefault("READ_DATABASE_URL", "sqlite+aiosqlite:///./bench_replica.db")
+os.environ.setdefault("READ_STICKY_SECONDS", "1")
+
+import argparse
+import asyncio
+import sys
+from sqlalchemy import delete, inspect, update
+from benchmarks.seed import seed
+from benchmarks.api import _login, make_client
+from src import models
+from src.base import Base, create_db_and_tables, engine, read_engine
+from src.databases import READ_STICKY_SECONDS
+
+# Проверка маршрутизации чтений на реплику: схема создаётся и в локальной реплике,
+# GET идут в реплику, а после своей записи пользователь READ_STICKY_SECONDS читает из основной БД.
+# Реплика заполняется теми же данными, но без заказов первого пользователя — так видно, откуда пришёл ответ
+async def main(args) -> int:
+    if read_engine is engine:
+        print("FAIL: READ_DATABASE_URL must point at a separate database")
+        return 1
+    failures = []
+
+    def check(name: str, condition: bool, detail: str = ""):
+        print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}".rstrip())
+        if not condition:
+            failures.append(name)
+
+    async with read_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await create_db_and_tables()
+    async with read_engine.connect() as connection:
+        tables = set(await connection.run_sync(lambda sync: inspect(sync).get_table_names()))
+    missing = set(Base.metadata.tables) - tables
+    check("schema created in the local replica", not missing, f"missing={sorted(missing)}" if missing else "")
+
+    for db_engine in (engine, read_engine):
+        await seed(db_engine, users=args.users, teas=args.teas, orders=args.orders)
+    async with engine.begin() as connection:
+        await connection.execute(update(models.Tea).values(stock=None, in_stock=True))
+    async with read_engine.begin() as connection:
+        own_orders = models.Order.__table__.select().with_only_columns(models.Order.id).where(models.Order.user_id == 1)
+        await connection.execute(delete(models.OrderItem).where(models.OrderItem.order_id.in_(own_orders)))
+        await connection.execute(delete(models.Order).where(models.Order.user_id == 1))
+
+    async with make_client() as client:
+        headers = {"Authorization": f"Bearer {await _login(client, 0)}"}
+
+        # limit меняется от запроса к запросу, чтобы ответ не брался из кэша списков заказов
+        async def count_orders(limit: int) -> int:
+            response = await client.get("/orders/", params={"limit": limit}, headers=headers)
+            response.raise_for_status()
+            return len(response.json())
+
+        check("GET reads from the replica", await count_orders(1000) == 0)
+        response = await client.post("/orders/", json={"items": [{"tea_id": 1, "quantity": 1}]}, headers=headers)
+        response.raise_for_status()
+        check("GET after own commit reads from the primary", await count_orders(999) > 0)
+        await asyncio.sleep(READ_STICKY_SECONDS + 0.2)
+        check("GET after READ_STICKY_SECONDS reads from the replica again", await count_orders(998) == 0)
+
+    if failures:
+        print(f"FAIL: {len(failures)} checks")
+        return 1
+    print("OK: read replica routing")
+    return 0
+
+# python -m benchmarks.read_replica
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check GET routing to a local SQLite replica and read-your-writes")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--teas", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=50)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import sys
+from benchmarks.seed import seed
+from benchmarks.api import _login, make_client
+
+# Метки route в /metrics: шаблон маршрута с префиксом роутера (/tea/{tea_id}), а не сырой путь
+# и не "unknown"; запрос мимо всех маршрутов — route="unmatched"
+EXPECTED_ROUTES = ("/tea/", "/tea/{tea_id}", "/orders/", "/orders/{order_id}", "/users/login", "unmatched")
+
+async def main(args) -> int:
+    if not args.skip_seed:
+        await seed(users=args.users, teas=args.teas, orders=args.orders)
+    async with make_client(args.base_url) as client:
+        headers = {"Authorization": f"Bearer {await _login(client, 0)}"}
+        await client.get("/tea/")
+        await client.get("/tea/1")
+        await client.get("/tea/2")
+        await client.get("/orders/", headers=headers)
+        await client.get("/orders/1", headers=headers)
+        await client.get("/no-such-route")
+        response = await client.get("/metrics")
+        response.raise_for_status()
+
+    series = [line for line in response.text.splitlines() if line.startswith("http_requests_total{")]
+    failures = [route for route in EXPECTED_ROUTES if not any(f'route="{route}"' in line for line in series)]
+    unknown = [line for line in response.text.splitlines() if 'route="unknown"' in line]
+    raw = [line for line in series if 'route="/tea/1"' in line or 'route="/tea/2"' in line]
+    for line in series:
+        print(line)
+    if failures or unknown or raw:
+        print(f"FAIL: missing routes {failures}, {len(unknown)} unknown series, {len(raw)} raw-path series")
+        return 1
+    print("OK: per-route metrics")
+    return 0
+
+# python -m benchmarks.route_metrics
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that /metrics labels series with route templates")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--teas", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--base-url", help="run against a running uvicorn instead of the in-process app")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,45 @@
+import argparse
+import asyncio
+import platform
+import sys
+from benchmarks.seed import add_seed_arguments, seed, seed_kwargs
+from benchmarks.stats import compare, print_report, save_report
+
+async def main(args) -> int:
+    if not args.skip_seed:
+        await seed(**seed_kwargs(args))
+    report = {"meta": {"python": platform.python_version(), "requests": args.requests,
+                       "concurrency": args.concurrency, "orders": args.orders, "users": args.users}}
+    if args.only in (None, "api"):
+        from benchmarks.api import run_api
+        report["api"] = await run_api(args)
+    if args.only in (None, "micro"):
+        from benchmarks.micro import run_micro
+        report["micro"] = await run_micro(args)
+
+    print_report(report)
+    if args.save:
+        save_report(report, args.save)
+    if args.compare:
+        regressions = compare(report, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+# python -m benchmarks.run --save baseline.json
+# python -m benchmarks.run --compare baseline.json --tolerance 0.2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API and micro benchmarks for the hot paths")
+    add_seed_arguments(parser)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--only", choices=["api", "micro"])
+    parser.add_argument("--base-url", help="benchmark a running uvicorn instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--save", help="write the JSON report (baseline) to this file")
+    parser.add_argument("--compare", help="fail on p95 regressions against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,101 @@
+import os
+
+# Бенчмарки работают с отдельной БД, по умолчанию локальный SQLite-файл
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.db")
+
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, text
+from src import models
+from src.auth import hash_password
+from src.base import Base, engine
+
+# Пароль всех сгенерированных пользователей (для бенчмарка логина)
+BENCH_PASSWORD = "password"
+
+def user_email(index: int) -> str:
+    return f"user{index}@example.com"
+
+async def _insert_chunks(connection, table, rows, chunk_size: int):
+    for start in range(0, len(rows), chunk_size):
+        await connection.execute(insert(table), rows[start:start + chunk_size])
+
+# Генерация данных: пользователи, чаи, заказы и позиции с явными id
+async def seed(db_engine=None, users: int = 1000, teas: int = 200, orders: int = 10000,
+               items_per_order: int = 3, chunk_size: int = 5000, seed: int = 42, reset: bool = True):
+    db_engine = db_engine or engine
+    rng = random.Random(seed)
+    async with db_engine.begin() as connection:
+        if reset:
+            await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+        hashed = hash_password(BENCH_PASSWORD)  # bcrypt один раз на всех
+        await _insert_chunks(connection, models.User.__table__, [
+            {"id": i + 1, "username": f"user{i}", "email": user_email(i), "hashed_password": hashed,
+             "is_active": True, "is_admin": i == 0}
+            for i in range(users)
+        ], chunk_size)
+
+        tea_types = ["green", "black", "oolong", "white", "puer", "herbal"]
+        tea_rows = [
+            {"id": i + 1, "name": f"Tea {i}", "description": f"Description of tea {i}",
+             "price": round(rng.uniform(2, 120), 2), "type": rng.choice(tea_types),
+             "weight": rng.choice([25, 50, 100, 250, 500]), "in_stock": rng.random() > 0.1}
+            for i in range(teas)
+        ]
+        await _insert_chunks(connection, models.Tea.__table__, tea_rows, chunk_size)
+        prices = [row["price"] for row in tea_rows]
+
+        now = datetime.now(timezone.utc)
+        statuses = ["pending", "paid", "shipped", "delivered", "cancelled"]
+        item_id = 0
+        for start in range(0, orders, chunk_size):
+            order_rows, item_rows = [], []
+            for order_id in range(start + 1, min(start + chunk_size, orders) + 1):
+                order = {
+                    "id": order_id, "user_id": rng.randrange(users) + 1,
+                    "created_at": now - timedelta(seconds=rng.randrange(3 * 365 * 24 * 3600)),
+                    "status": rng.choice(statuses),
+                }
+                total = 0.0
+                for _ in range(rng.randint(1, 2 * items_per_order - 1)):
+                    item_id += 1
+                    tea_index, quantity = rng.randrange(teas), rng.randint(1, 5)
+                    item_rows.append({"id": item_id, "order_id": order_id, "tea_id": tea_index + 1,
+                                      "quantity": quantity, "unit_price": prices[tea_index]})
+                    total += prices[tea_index] * quantity
+                order["total"] = round(total, 2)
+                order_rows.append(order)
+            await connection.execute(insert(models.Order.__table__), order_rows)
+            await _insert_chunks(connection, models.OrderItem.__table__, item_rows, chunk_size)
+
+        # id заданы явно — в PostgreSQL нужно подвинуть последовательности
+        if connection.dialect.name == "postgresql":
+            for table in Base.metadata.sorted_tables:
+                if "id" in table.c:
+                    await connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                    ))
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--teas", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--items-per-order", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+
+def seed_kwargs(args) -> dict:
+    return {"users": args.users, "teas": args.teas, "orders": args.orders,
+            "items_per_order": args.items_per_order, "chunk_size": args.chunk_size, "seed": args.seed}
+
+# python -m benchmarks.seed --orders 100000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the benchmark database")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(seed(**seed_kwargs(args)))
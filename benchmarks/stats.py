@@ -0,0 +1,52 @@
+import json
+
+# Перцентиль по отсортированному списку (ближайший ранг)
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+# Сводка по замерам в миллисекундах
+def summarize(timings_ms: list[float], elapsed_s: float | None = None) -> dict:
+    timings_ms = sorted(timings_ms)
+    summary = {
+        "count": len(timings_ms),
+        "p50_ms": round(percentile(timings_ms, 50), 3),
+        "p95_ms": round(percentile(timings_ms, 95), 3),
+        "p99_ms": round(percentile(timings_ms, 99), 3),
+    }
+    if elapsed_s:
+        summary["rps"] = round(len(timings_ms) / elapsed_s, 1)
+    return summary
+
+def print_report(report: dict):
+    for section, results in report.items():
+        if section == "meta":
+            continue
+        print(f"== {section}")
+        for name, summary in results.items():
+            rps = f", {summary['rps']} req/s" if "rps" in summary else ""
+            print(f"   {name:<28} p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms  "
+                  f"p99 {summary['p99_ms']:>9} ms{rps}")
+
+def save_report(report: dict, path: str):
+    with open(path, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+# Регрессии относительно сохранённой базовой линии: рост p95 больше чем на tolerance (доля)
+def compare(report: dict, baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as source:
+        baseline = json.load(source)
+    regressions = []
+    for section, results in report.items():
+        if section == "meta":
+            continue
+        for name, summary in results.items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous or not previous.get("p95_ms"):
+                continue
+            ratio = summary["p95_ms"] / previous["p95_ms"]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{section}/{name}: p95 {previous['p95_ms']} -> {summary['p95_ms']} ms (x{ratio:.2f})")
+    return regressions
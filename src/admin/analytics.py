@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import rollups
+from src.databases import UnitOfWorkRoute, get_db, get_read_db
+from src.schemas import DailyBuyers, DailyStatusSales, TeaSales, User
+from src.routers.users import get_current_admin
+from src.admin import crud
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Период отчёта по умолчанию — последние 30 дней
+DEFAULT_PERIOD_DAYS = 30
+
+def _period(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    return date_from, date_to
+
+# Самые продаваемые чаи за период (единицы и выручка, без отменённых заказов)
+@router.get("/teas", response_model=list[TeaSales])
+async def admin_tea_sales(date_from: Optional[date] = None, date_to: Optional[date] = None, limit: int = Query(20, ge=1, le=crud.ADMIN_MAX_LIMIT),
+                          db: AsyncSession = Depends(get_read_db), current_admin: User = Depends(get_current_admin)):
+    return await crud.get_tea_sales(db, *_period(date_from, date_to), limit=limit)
+
+# Заказы и выручка по статусам по дням
+@router.get("/statuses", response_model=list[DailyStatusSales])
+async def admin_status_sales(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                             db: AsyncSession = Depends(get_read_db), current_admin: User = Depends(get_current_admin)):
+    return await crud.get_daily_status_sales(db, *_period(date_from, date_to))
+
+# Активные покупатели по дням
+@router.get("/buyers", response_model=list[DailyBuyers])
+async def admin_daily_buyers(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                             db: AsyncSession = Depends(get_read_db), current_admin: User = Depends(get_current_admin)):
+    return await crud.get_daily_buyers(db, *_period(date_from, date_to))
+
+# Догнать агрегаты прямо сейчас, не дожидаясь фонового задания
+@router.post("/refresh")
+async def admin_refresh_rollups(db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
+    return {"processed": await rollups.catch_up(db)}
@@ -1,14 +1,147 @@
+from pydantic import ValidationError
+from datetime import date, datetime
+from sqlalchemy import case, func, insert, union_all, update
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from src import models, schemas
-from src.auth import hash_password
+from src.admin.export import EXPORT_CHUNK_ROWS
+from src import models, rows, schemas
+from src.base import UPSERT_INSERTS
+from src.cache import invalidate_catalog, invalidate_principal
+from src.auth import hash_password_async
 
 # -------- Пользователи (Admin Users) -------- #
 
-# Получение всех пользователей
-async def get_users(db: AsyncSession):
-    result = await db.execute(select(models.User))
-    return result.scalars().all()
+# Максимальный размер страницы JSON-списков в админке
+ADMIN_MAX_LIMIT = 500
+
+# Получение пользователей постранично (без ограничения одна страница могла бы занять всю память);
+# лёгкие строки rows.UserRow без hashed_password и без отслеживания сессией
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    limit = min(limit, ADMIN_MAX_LIMIT)
+    result = await db.execute(select(*rows.USER_COLUMNS).order_by(models.User.id).offset(skip).limit(limit))
+    return [rows.UserRow(*row) for row in result]
+
+# Поля экспорта пользователей (hashed_password не выгружается никогда)
+USER_EXPORT_FIELDS = ["id", "username", "email", "is_active", "is_admin"]
+
+# Потоковое чтение пользователей для экспорта: серверный курсор, только нужные колонки
+async def stream_users(db: AsyncSession):
+    columns = [getattr(models.User, field) for field in USER_EXPORT_FIELDS]
+    query = select(*columns).order_by(models.User.id).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield dict(row)
+
+# -------- Заказы (Admin Orders) -------- #
+
+# Поля экспорта заказов: одна строка CSV на позицию заказа
+ORDER_EXPORT_FIELDS = ["order_id", "user_id", "created_at", "status", "tea_id", "quantity"]
+
+def _order_lines(order_model, item_model):
+    return (
+        select(
+            order_model.id.label("order_id"),
+            order_model.user_id,
+            order_model.created_at,
+            order_model.status,
+            item_model.tea_id,
+            item_model.quantity,
+            item_model.id.label("item_id"),
+        )
+        .outerjoin(item_model, item_model.order_id == order_model.id)
+    )
+
+# Потоковое чтение заказов с позициями (внешнее соединение, чтобы попали и пустые заказы).
+# Текущие и архивные заказы читаются одним запросом UNION ALL — один снимок данных,
+# заказ, который переносится в архив во время экспорта, не потеряется и не повторится
+async def stream_order_lines(db: AsyncSession):
+    lines = union_all(
+        _order_lines(models.Order, models.OrderItem),
+        _order_lines(models.ArchivedOrder, models.ArchivedOrderItem),
+    ).subquery()
+    query = (
+        select(*(lines.c[field] for field in ["order_id", "user_id", "created_at", "status", "tea_id", "quantity"]))
+        .order_by(lines.c.order_id, lines.c.item_id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield dict(row)
+
+# Заказы целиком для NDJSON: подряд идущие строки одного заказа собираются в items
+async def stream_orders(db: AsyncSession):
+    order = None
+    async for line in stream_order_lines(db):
+        if order is None or order["id"] != line["order_id"]:
+            if order is not None:
+                yield order
+            order = {"id": line["order_id"], "user_id": line["user_id"], "created_at": line["created_at"],
+                     "status": line["status"], "items": []}
+        if line["tea_id"] is not None:
+            order["items"].append({"tea_id": line["tea_id"], "quantity": line["quantity"]})
+    if order is not None:
+        yield order
+
+def _revenue_orders(order_model, date_from: datetime | None, date_to: datetime | None):
+    query = select(order_model.status, order_model.total)
+    if date_from is not None:
+        query = query.filter(order_model.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(order_model.created_at < date_to)
+    return query
+
+# Выручка за период одним агрегирующим запросом по orders.total (позиции и чай не читаются);
+# архивные заказы входят в отчёт наравне с текущими
+async def get_revenue(db: AsyncSession, date_from: datetime | None = None, date_to: datetime | None = None) -> schemas.RevenueReport:
+    orders = union_all(
+        _revenue_orders(models.Order, date_from, date_to),
+        _revenue_orders(models.ArchivedOrder, date_from, date_to),
+    ).subquery()
+    query = select(
+        orders.c.status,
+        func.count(),
+        func.coalesce(func.sum(orders.c.total), 0.0),
+    ).group_by(orders.c.status).order_by(orders.c.status)
+    result = await db.execute(query)
+    by_status = [schemas.RevenueByStatus(status=status, orders=orders, revenue=round(revenue, 2))
+                 for status, orders, revenue in result.all()]
+    counted = [row for row in by_status if row.status != models.ORDER_CANCELLED]
+    return schemas.RevenueReport(
+        orders=sum(row.orders for row in counted),
+        revenue=round(sum(row.revenue for row in counted), 2),
+        by_status=by_status,
+    )
+
+ORDER_BACKFILL_BATCH = 1000
+
+# Заполнение unit_price и total у заказов, созданных до появления этих колонок.
+# Исторической цены нет, поэтому берётся текущая Tea.price. Порциями — каждая в своей транзакции
+async def backfill_order_totals(db: AsyncSession, batch_size: int = ORDER_BACKFILL_BATCH) -> int:
+    updated = 0
+    while True:
+        result = await db.execute(
+            select(models.Order.id).filter(models.Order.total.is_(None)).order_by(models.Order.id).limit(batch_size)
+        )
+        order_ids = result.scalars().all()
+        if not order_ids:
+            return updated
+        await db.execute(
+            update(models.OrderItem)
+            .where(models.OrderItem.order_id.in_(order_ids), models.OrderItem.unit_price.is_(None))
+            .values(unit_price=select(models.Tea.price).where(models.Tea.id == models.OrderItem.tea_id).scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+        line_totals = select(func.coalesce(func.sum(models.OrderItem.quantity * models.OrderItem.unit_price), 0.0)) \
+            .where(models.OrderItem.order_id == models.Order.id).scalar_subquery()
+        await db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(order_ids))
+            .values(total=line_totals)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        updated += len(order_ids)
 
 # Обновление пользователя (назначение администратора и т.д.)
 async def update_user(db: AsyncSession, user_id: int, user: schemas.UserCreate):
@@ -17,9 +150,10 @@ async def update_user(db: AsyncSession, user_id: int, user: schemas.UserCreate):
     if db_user:
         db_user.username = user.username
         db_user.email = user.email
-        db_user.hashed_password = hash_password(user.password)
+        db_user.hashed_password = await hash_password_async(user.password)
         db_user.is_admin = user.is_admin  # Возможность обновлять роль администратора
         await db.commit()
+        await invalidate_principal(user_id)
         await db.refresh(db_user)
     return db_user
 
@@ -30,15 +164,17 @@ async def delete_user(db: AsyncSession, user_id: int):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+        await invalidate_principal(user_id)
     return db_user
 
 # -------- Товары (Admin Tea) -------- #
 
 # Создание товара (чая)
 async def create_tea(db: AsyncSession, tea: schemas.TeaCreate):
-    db_tea = models.Tea(**tea.dict())
+    db_tea = models.Tea(**tea.model_dump())
     db.add(db_tea)
     await db.commit()
+    await invalidate_catalog()
     await db.refresh(db_tea)
     return db_tea
 
@@ -47,9 +183,10 @@ async def update_tea(db: AsyncSession, tea_id: int, tea: schemas.TeaCreate):
     result = await db.execute(select(models.Tea).filter(models.Tea.id == tea_id))
     db_tea = result.scalar()
     if db_tea:
-        for key, value in tea.dict().items():
+        for key, value in tea.update_values(tracked=db_tea.stock is not None).items():
             setattr(db_tea, key, value)
         await db.commit()
+        await invalidate_catalog()
         await db.refresh(db_tea)
     return db_tea
 
@@ -60,4 +197,110 @@ async def delete_tea(db: AsyncSession, tea_id: int):
     if db_tea:
         await db.delete(db_tea)
         await db.commit()
+        await invalidate_catalog()
     return db_tea
+
+# -------- Массовый импорт каталога (Admin Tea Bulk) -------- #
+
+BULK_DEFAULT_CHUNK_SIZE = 1000
+BULK_MAX_CHUNK_SIZE = 5000
+
+# INSERT ... ON CONFLICT (sku) DO UPDATE (диалект проверен при старте — check_database_dialect)
+def _tea_upsert(dialect_name: str, rows: list[dict]):
+    statement = UPSERT_INSERTS[dialect_name](models.Tea).values([{"stock": None, **row} for row in rows])
+    updated_columns = {column: statement.excluded[column] for column in rows[0] if column != "sku"}
+    if "stock" not in rows[0]:
+        # строка без stock не меняет учёт остатка: при учитываемом остатке сохраняется и наличие
+        updated_columns["in_stock"] = case(
+            (models.Tea.stock.is_(None), statement.excluded.in_stock), else_=models.Tea.in_stock,
+        )
+    return statement.on_conflict_do_update(index_elements=[models.Tea.sku], set_=updated_columns)
+
+async def _upsert_tea_chunk(db: AsyncSession, rows: list[dict]) -> tuple[int, int]:
+    # строки без артикула просто вставляются; с артикулом — upsert, последняя строка с тем же sku побеждает
+    with_sku = [row for row in rows if row.get("sku")]
+    by_sku = {row["sku"]: row for row in with_sku}
+    plain = [row for row in rows if not row.get("sku")]
+    updated = len(with_sku) - len(by_sku)  # повторы sku внутри порции перезаписаны последней строкой
+    if by_sku:
+        result = await db.execute(select(models.Tea.sku).filter(models.Tea.sku.in_(by_sku.keys())))
+        updated += len(result.scalars().all())
+        # строки со stock и без него — разные наборы обновляемых колонок
+        for with_stock in (True, False):
+            group = [row for row in by_sku.values() if ("stock" in row) == with_stock]
+            if group:
+                await db.execute(_tea_upsert(db.bind.dialect.name, group))
+    if plain:
+        await db.execute(insert(models.Tea).values([{"stock": None, **row} for row in plain]))
+    return len(with_sku) - updated + len(plain), updated
+
+# Массовый импорт/обновление чаев: каждая порция (chunk_size строк) — отдельная транзакция,
+# ошибка порции откатывает только её
+async def bulk_upsert_teas(db: AsyncSession, rows: list[dict], chunk_size: int = BULK_DEFAULT_CHUNK_SIZE) -> schemas.TeaBulkResult:
+    report = schemas.TeaBulkResult()
+    valid: list[tuple[int, dict]] = []
+    for index, row in enumerate(rows):
+        try:
+            tea = schemas.TeaCreate(**row)
+            # stock, которого нет в строке, не попадает в upsert и не сбрасывает учёт остатка
+            valid.append((index, tea.model_dump(exclude=None if "stock" in tea.model_fields_set else {"stock"})))
+        except (ValidationError, TypeError) as exc:
+            report.failed += 1
+            report.errors.append(schemas.TeaBulkError(row=index, error=str(exc)))
+
+    chunk_size = max(1, min(chunk_size, BULK_MAX_CHUNK_SIZE))
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            inserted, updated = await _upsert_tea_chunk(db, [row for _, row in chunk])
+            await db.commit()
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            report.failed += len(chunk)
+            report.errors.append(schemas.TeaBulkError(row=chunk[0][0], error=f"chunk of {len(chunk)} rows failed: {exc.__class__.__name__}"))
+            continue
+        report.inserted += inserted
+        report.updated += updated
+    await invalidate_catalog()
+    return report
+
+# -------- Аналитика по дневным агрегатам (Admin Analytics) -------- #
+# Запросы читают только таблицы sales_daily_* за выбранные дни — стоимость не зависит от истории заказов
+
+# Самые продаваемые чаи за период [date_from, date_to]
+async def get_tea_sales(db: AsyncSession, date_from: date, date_to: date, limit: int = 20) -> list[schemas.TeaSales]:
+    sales = models.SalesDailyTea
+    units, revenue = func.sum(sales.units), func.sum(sales.revenue)
+    result = await db.execute(
+        select(sales.tea_id, models.Tea.name, units, revenue)
+        .outerjoin(models.Tea, models.Tea.id == sales.tea_id)
+        .where(sales.day >= date_from, sales.day <= date_to)
+        .group_by(sales.tea_id, models.Tea.name)
+        .having(units != 0)
+        .order_by(revenue.desc())
+        .limit(limit)
+    )
+    return [schemas.TeaSales(tea_id=tea_id, name=name, units=units, revenue=round(revenue, 2))
+            for tea_id, name, units, revenue in result.all()]
+
+# Заказы и выручка по статусам по дням
+async def get_daily_status_sales(db: AsyncSession, date_from: date, date_to: date) -> list[schemas.DailyStatusSales]:
+    sales = models.SalesDailyStatus
+    result = await db.execute(
+        select(sales.day, sales.status, sales.orders, sales.revenue)
+        .where(sales.day >= date_from, sales.day <= date_to, sales.orders != 0)
+        .order_by(sales.day, sales.status)
+    )
+    return [schemas.DailyStatusSales(day=day, status=status, orders=orders, revenue=round(revenue, 2))
+            for day, status, orders, revenue in result.all()]
+
+# Число активных покупателей по дням
+async def get_daily_buyers(db: AsyncSession, date_from: date, date_to: date) -> list[schemas.DailyBuyers]:
+    buyers = models.SalesDailyBuyer
+    result = await db.execute(
+        select(buyers.day, func.count())
+        .where(buyers.day >= date_from, buyers.day <= date_to, buyers.orders > 0)
+        .group_by(buyers.day)
+        .order_by(buyers.day)
+    )
+    return [schemas.DailyBuyers(day=day, buyers=count) for day, count in result.all()]
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from src.base import engine, pool_stats, read_engine
+from src.databases import UnitOfWorkRoute
+from src.schemas import User
+from src.routers.users import get_current_admin
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Состояние пула соединений с БД (занято, overflow, время ожидания)
+@router.get("/pool")
+async def admin_pool_stats(current_admin: User = Depends(get_current_admin)):
+    stats = pool_stats()
+    if read_engine is not engine:
+        stats["replica"] = pool_stats(read_engine)
+    return stats
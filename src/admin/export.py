@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+
+# Сколько строк собирать в один кусок ответа
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Unsupported export value: {value!r}")
+
+# NDJSON: одна запись — одна строка, отдаём кусками по EXPORT_CHUNK_ROWS
+async def ndjson_chunks(records):
+    lines = []
+    async for record in records:
+        lines.append(json.dumps(record, default=_json_default, ensure_ascii=False))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+# CSV с заголовком, тоже кусками; буфер переиспользуется, память не растёт
+async def csv_chunks(fields: list[str], records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for record in records:
+        writer.writerow([record.get(field) for field in fields])
+        rows += 1
+        if rows >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows = 0
+    if buffer.getvalue():
+        yield buffer.getvalue().encode()
+
+# Потоковый ответ экспорта в нужном формате
+def export_response(records, fields: list[str], format: str, filename: str) -> StreamingResponse:
+    if format == "csv":
+        body, media_type = csv_chunks(fields, records), "text/csv"
+    else:
+        body, media_type = ndjson_chunks(records), "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import archive, crud as shop_crud
+from src.base import AsyncReadSessionLocal
+from src.databases import UnitOfWorkRoute, get_db, get_read_db
+from src.schemas import Order, RevenueReport, User
+from src.routers.users import get_current_admin
+from src.admin import crud
+from src.admin.export import export_response
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Административный маршрут для получения списка всех заказов (постранично, limit ограничен)
+@router.get("/", response_model=list[Order])
+async def admin_get_orders(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=crud.ADMIN_MAX_LIMIT),
+                           include_items: bool = True,
+                           db: AsyncSession = Depends(get_read_db), current_admin: User = Depends(get_current_admin)):
+    return await shop_crud.get_orders(db=db, skip=skip, limit=limit, eager=include_items)
+
+# Выручка за период [date_from, date_to) с разбивкой по статусам
+@router.get("/revenue", response_model=RevenueReport)
+async def admin_revenue(date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                        db: AsyncSession = Depends(get_read_db), current_admin: User = Depends(get_current_admin)):
+    return await crud.get_revenue(db, date_from=date_from, date_to=date_to)
+
+# Разовое заполнение сумм у старых заказов (до появления total/unit_price)
+@router.post("/backfill-totals")
+async def admin_backfill_order_totals(db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
+    return {"updated": await crud.backfill_order_totals(db)}
+
+# Перенос старых заказов в конечном статусе в архив (обычно запускается по расписанию: python -m src.archive)
+@router.post("/archive")
+async def admin_archive_orders(older_than_days: int = Query(archive.ARCHIVE_AFTER_DAYS, ge=0),
+                               db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
+    return {"archived": await archive.archive_orders(db, older_than_days)}
+
+# Потоковый экспорт заказов: NDJSON — заказ с вложенными позициями, CSV — строка на позицию
+@router.get("/export")
+async def admin_export_orders(format: Literal["ndjson", "csv"] = "ndjson", current_admin: User = Depends(get_current_admin)):
+    stream = crud.stream_orders if format == "ndjson" else crud.stream_order_lines
+
+    async def records():
+        async with AsyncReadSessionLocal() as db:
+            async for record in stream(db):
+                yield record
+    return export_response(records(), crud.ORDER_EXPORT_FIELDS, format, "orders")
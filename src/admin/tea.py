@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import csv
+import io
+from typing import Any
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Query, Request, UploadFile
 from fastapi.responses import HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.databases import get_db
-from src.schemas import Tea, TeaCreate
+from src.databases import UnitOfWorkRoute, get_db
+from src.schemas import Tea, TeaBulkResult, TeaCreate
 from src.routers.users import get_current_admin
 from src.admin import crud
+from src.cache import catalog_cache
+from src.shared_cache import shared_cache
 from fastapi.templating import Jinja2Templates
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 templates = Jinja2Templates(directory="src/templates")
@@ -15,11 +20,33 @@ templates = Jinja2Templates(directory="src/templates")
 
 
 
+# Статистика кэша каталога (попадания, промахи, вытеснения)
+@router.get("/cache/stats")
+async def admin_catalog_cache_stats(current_admin: Tea = Depends(get_current_admin)):
+    return {"catalog": catalog_cache.stats(), "shared": shared_cache.stats()}
+
 # Административный маршрут для создания товара
 @router.post("/", response_model=Tea)
 async def admin_create_tea(tea: TeaCreate, db: AsyncSession = Depends(get_db), current_admin: Tea = Depends(get_current_admin)):
     return await crud.create_tea(db=db, tea=tea)
 
+# Массовый импорт каталога из JSON-массива строк TeaCreate (upsert по sku)
+@router.post("/bulk", response_model=TeaBulkResult)
+async def admin_bulk_upsert_teas(rows: list[dict[str, Any]] = Body(...),
+                                 chunk_size: int = Query(crud.BULK_DEFAULT_CHUNK_SIZE, ge=1, le=crud.BULK_MAX_CHUNK_SIZE),
+                                 db: AsyncSession = Depends(get_db), current_admin: Tea = Depends(get_current_admin)):
+    return await crud.bulk_upsert_teas(db=db, rows=rows, chunk_size=chunk_size)
+
+# Массовый импорт каталога из CSV с заголовком (колонки как у TeaCreate)
+@router.post("/bulk/csv", response_model=TeaBulkResult)
+async def admin_bulk_upsert_teas_csv(file: UploadFile = File(...),
+                                     chunk_size: int = Query(crud.BULK_DEFAULT_CHUNK_SIZE, ge=1, le=crud.BULK_MAX_CHUNK_SIZE),
+                                     db: AsyncSession = Depends(get_db), current_admin: Tea = Depends(get_current_admin)):
+    content = (await file.read()).decode("utf-8-sig")
+    # пустые ячейки считаем отсутствующими, чтобы сработали значения по умолчанию
+    rows = [{key: value for key, value in row.items() if value != ""} for row in csv.DictReader(io.StringIO(content))]
+    return await crud.bulk_upsert_teas(db=db, rows=rows, chunk_size=chunk_size)
+
 # Административный маршрут для обновления товара
 @router.put("/{tea_id}", response_model=Tea)
 async def admin_update_tea(tea_id: int, tea: TeaCreate, db: AsyncSession = Depends(get_db), current_admin: Tea = Depends(get_current_admin)):
@@ -1,22 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.databases import get_db
+from src.base import AsyncReadSessionLocal
+from src.databases import UnitOfWorkRoute, get_db
 from src.schemas import User, UserCreate
 from src.routers.users import get_current_admin
 from src.admin import crud
+from src.admin.export import export_response
+from src.auth import password_pool_stats
 from fastapi.templating import Jinja2Templates
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 templates = Jinja2Templates(directory="src/templates")
-# Административный маршрут для получения списка всех пользователей
+# Административный маршрут для получения списка пользователей (постранично, limit ограничен)
 @router.get("/", response_model=list[User])
-async def admin_get_users(db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
-    users = await crud.get_users(db=db)
+async def admin_get_users(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=crud.ADMIN_MAX_LIMIT),
+                          db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
+    users = await crud.get_users(db=db, skip=skip, limit=limit)
     return users
 
+# Потоковый экспорт всех пользователей в NDJSON или CSV с постоянным расходом памяти
+@router.get("/export")
+async def admin_export_users(format: Literal["ndjson", "csv"] = "ndjson", current_admin: User = Depends(get_current_admin)):
+    # Сессия живёт внутри генератора: ответ читается уже после выхода из зависимостей
+    async def records():
+        async with AsyncReadSessionLocal() as db:
+            async for record in crud.stream_users(db):
+                yield record
+    return export_response(records(), crud.USER_EXPORT_FIELDS, format, "users")
+
+# Состояние пула хеширования паролей (очередь, отказы)
+@router.get("/password-pool/stats")
+async def admin_password_pool_stats(current_admin: User = Depends(get_current_admin)):
+    return password_pool_stats()
+
 # Административный маршрут для обновления данных пользователя (например, назначение администратора)
 @router.put("/{user_id}", response_model=User)
 async def admin_update_user(user_id: int, user: UserCreate, db: AsyncSession = Depends(get_db), current_admin: User = Depends(get_current_admin)):
@@ -38,6 +58,6 @@ async def admin_delete_user(user_id: int, db: AsyncSession = Depends(get_db), cu
 
 # Страница для управления пользователями
 @router.get("/", response_class=HTMLResponse)
-async def admin_users_page(request: Request, db: AsyncSession = Depends(get_db), current_admin = Depends(get_current_admin)):
-    users = await crud.get_users(db)
+async def admin_users_page(request: Request, skip: int = Query(0, ge=0), db: AsyncSession = Depends(get_db), current_admin = Depends(get_current_admin)):
+    users = await crud.get_users(db, skip=skip)
     return templates.TemplateResponse("admin/users.html", {"request": request, "users": users})
\ No newline at end of file
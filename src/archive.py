@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from src import models, rollups
+from src.base import AsyncSessionLocal, check_database_dialect
+
+# Возраст (дни), после которого заказ в конечном статусе переносится в архив, и размер порции
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "1000"))
+
+ORDER_FIELDS = ["id", "user_id", "created_at", "status", "total"]
+ORDER_ITEM_FIELDS = ["id", "order_id", "tea_id", "quantity", "unit_price"]
+
+# Перенос порции заказов с позициями в архив: INSERT ... SELECT и DELETE в одной транзакции
+async def _move(db: AsyncSession, order_ids: list[int]):
+    await db.execute(
+        insert(models.ArchivedOrder).from_select(
+            ORDER_FIELDS,
+            select(*(getattr(models.Order, name) for name in ORDER_FIELDS)).where(models.Order.id.in_(order_ids)),
+        )
+    )
+    await db.execute(
+        insert(models.ArchivedOrderItem).from_select(
+            ORDER_ITEM_FIELDS,
+            select(*(getattr(models.OrderItem, name) for name in ORDER_ITEM_FIELDS))
+            .where(models.OrderItem.order_id.in_(order_ids)),
+        )
+    )
+    await db.execute(
+        delete(models.OrderItem).where(models.OrderItem.order_id.in_(order_ids)).execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(models.Order).where(models.Order.id.in_(order_ids)).execution_options(synchronize_session=False)
+    )
+
+# Архивация заказов старше older_than_days в конечном статусе, порциями по batch_size (каждая — своя транзакция).
+# Переносятся только заказы, уже учтённые в дневных агрегатах (id не больше водяного знака),
+# поэтому сначала догоняются агрегаты. Строки блокируются FOR UPDATE SKIP LOCKED —
+# заказ, который сейчас меняется, уйдёт в следующий прогон
+async def archive_orders(db: AsyncSession, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH) -> int:
+    await rollups.catch_up(db)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    watermark = (
+        select(models.RollupWatermark.last_id)
+        .where(models.RollupWatermark.name == rollups.ORDERS_WATERMARK)
+        .scalar_subquery()
+    )
+    archived = 0
+    try:
+        while True:
+            result = await db.execute(
+                select(models.Order.id)
+                .where(
+                    models.Order.created_at < cutoff,
+                    models.Order.status.in_(models.ORDER_TERMINAL_STATUSES),
+                    models.Order.id <= watermark,
+                )
+                .order_by(models.Order.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            order_ids = result.scalars().all()
+            if not order_ids:
+                await db.commit()
+                return archived
+            await _move(db, order_ids)
+            await db.commit()
+            archived += len(order_ids)
+    except Exception:
+        await db.rollback()
+        raise
+
+# python -m src.archive --days 365 — разовый прогон (например, из cron)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old orders in a terminal status to the archive tables")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch", type=int, default=ARCHIVE_BATCH)
+    args = parser.parse_args()
+
+    async def main():
+        check_database_dialect()
+        async with AsyncSessionLocal() as db:
+            print(f"archived {await archive_orders(db, args.days, args.batch)} orders")
+    asyncio.run(main())
@@ -1,6 +1,12 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from src.cache import TTLCache
+from src.metrics import observe_phase
 
 # Определяем контекст для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,6 +24,70 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# -------- Пул для bcrypt (чтобы хеширование не блокировало event loop) -------- #
+
+# Тип пула (thread | process), число воркеров и лимит ожидающих задач (backpressure)
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+_password_executor: Executor | None = None
+_password_pending = 0
+_password_rejected = 0
+
+# Пул перегружен — запрос лучше отклонить, чем копить очередь
+class PasswordHasherBusy(Exception):
+    pass
+
+def _get_password_executor() -> Executor:
+    global _password_executor
+    if _password_executor is None:
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _password_executor
+
+async def _run_in_password_pool(func, *args):
+    global _password_pending, _password_rejected
+    if _password_pending >= PASSWORD_HASH_MAX_PENDING:
+        _password_rejected += 1
+        raise PasswordHasherBusy()
+    _password_pending += 1
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_password_executor(), func, *args)
+    finally:
+        _password_pending -= 1
+        observe_phase("bcrypt", time.perf_counter() - start)
+
+# Асинхронное хеширование пароля в пуле
+async def hash_password_async(password: str) -> str:
+    return await _run_in_password_pool(hash_password, password)
+
+# Асинхронная проверка пароля в пуле
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+# Состояние пула: queue_depth — задачи, ждущие свободного воркера
+def password_pool_stats() -> dict:
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "pending": _password_pending,
+        "queue_depth": max(0, _password_pending - PASSWORD_HASH_WORKERS),
+        "rejected": _password_rejected,
+    }
+
+# Остановка пула при завершении приложения
+def shutdown_password_pool():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
+
 # Функция для создания JWT-токена
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -29,13 +99,27 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Кэш проверенных токенов: token -> (user_id, exp), чтобы не проверять HS256 для горячих токенов
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", "60")),
+)
+
 # Функция для проверки JWT-токена
 def decode_access_token(token: str):
+    cached = token_cache.get(token, None)
+    if cached is not None:
+        user_id, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return user_id
+        token_cache.delete(token)
+        return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise JWTError
+        token_cache.set(token, (user_id, payload.get("exp")))
         return user_id
     except JWTError:
         return None
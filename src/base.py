@@ -1,18 +1,179 @@
+import logging
 import os
+import time
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
-load_dotenv
+logger = logging.getLogger(__name__)
+
+load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Реплика только для чтения; если не задана, чтения идут в основную БД
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL") or DATABASE_URL
+
+# -------- Настройки пула соединений (из .env) -------- #
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+DB_ECHO = _env_bool("DB_ECHO", False)  # логирование SQL синхронно и дорого, по умолчанию выключено
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))  # кэш скомпилированных SQL
+
+# Статистика ожидания соединения из пула
+class PoolWaitStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+# Пул, который замеряет время получения соединения
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    # SQLite в памяти работает на StaticPool — параметры очереди к нему не применимы
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return kwargs
+    kwargs.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return kwargs
+
+engine = create_async_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+if READ_DATABASE_URL == DATABASE_URL:
+    read_engine = engine
+else:
+    read_engine = create_async_engine(READ_DATABASE_URL, **_engine_kwargs(READ_DATABASE_URL))
+
+# Состояние пула: занятые соединения, overflow, время ожидания
+def pool_stats(db_engine=None) -> dict:
+    pool = (db_engine or engine).pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, TimedQueuePool):
+        wait = pool.wait_stats
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+            checkouts=wait.checkouts,
+            avg_wait_ms=round(wait.total_wait / wait.checkouts * 1000, 3) if wait.checkouts else 0.0,
+            max_wait_ms=round(wait.max_wait * 1000, 3),
+        )
+    return stats
 
 Base = declarative_base()
 
-async def create_db_and_tables():
-    async with engine.begin() as connection:
+# INSERT ... ON CONFLICT DO UPDATE (upsert каталога, агрегаты продаж) есть только у этих диалектов
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Проверка при старте: с другой БД приложение не запускается, а не падает 500 на первом upsert
+def check_database_dialect(db_engine=None):
+    dialect_name = (db_engine or engine).dialect.name
+    if dialect_name not in UPSERT_INSERTS:
+        raise RuntimeError(
+            f"Unsupported database dialect {dialect_name!r}: PostgreSQL or SQLite is required (INSERT ... ON CONFLICT)"
+        )
+
+# Расширение pg_trgm для триграммного индекса по названию чая. Роль без права CREATE EXTENSION
+# не блокирует старт: индекс пропускается (pg_trgm_available), поиск подстроки работает без него
+def _enable_pg_trgm(sync_connection):
+    installed = sync_connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar()
+    if not installed:
+        try:
+            with sync_connection.begin_nested():
+                sync_connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            installed = True
+        except DBAPIError as exc:
+            logger.warning("pg_trgm is not available, trigram index on tea names is skipped: %s", exc.orig)
+    sync_connection.info["pg_trgm"] = bool(installed)
+
+# Условие ddl_if для индексов, которым нужен pg_trgm
+def pg_trgm_available(ddl, target, bind, **kw) -> bool:
+    return bind is not None and bind.info.get("pg_trgm", False)
+
+async def _create_schema(db_engine):
+    async with db_engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            await connection.run_sync(_enable_pg_trgm)
         await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(create_missing_columns)
+        await connection.run_sync(create_missing_indexes)
+
+# Схема создаётся в основной БД. Настоящая реплика получает её репликацией и доступна только
+# на чтение, а локальная «реплика» — отдельный файл SQLite — создаётся здесь же
+async def create_db_and_tables():
+    await _create_schema(engine)
+    if read_engine is not engine and read_engine.dialect.name == "sqlite":
+        await _create_schema(read_engine)
+
+# Миграция колонок: новые колонки моделей добавляются в существующие таблицы через ALTER TABLE.
+# Уникальность задаётся индексами (create_missing_indexes), NOT NULL — только вместе с server_default
+def create_missing_columns(sync_connection):
+    inspector = inspect(sync_connection)
+    existing_tables = set(inspector.get_table_names())
+    preparer = sync_connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} " \
+                  f"{column.type.compile(dialect=sync_connection.dialect)}"
+            if column.server_default is not None:
+                default = column.server_default.arg
+                ddl += f" DEFAULT {getattr(default, 'text', default)}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            sync_connection.execute(text(ddl))
+
+# Миграция индексов: create_all не трогает уже существующие таблицы,
+# поэтому недостающие индексы из моделей создаём отдельно (идемпотентно)
+def create_missing_indexes(sync_connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_connection, checkfirst=True)
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
@@ -21,3 +182,12 @@ AsyncSessionLocal = sessionmaker(
     autocommit=False,
     expire_on_commit=False
 )
+
+# Сессии для GET-запросов (реплика)
+AsyncReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    autocommit=False,
+    expire_on_commit=False
+)
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from src.shared_cache import shared_cache
+
+# Маркер отсутствия значения (None тоже кэшируется — например, «чай не найден»)
+MISSING = object()
+
+# Ограниченный кэш в памяти процесса: TTL для каждой записи + вытеснение LRU
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Кэш каталога чаев (настраивается через .env)
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+)
+
+# Готовые байты ответов GET /tea/ (без БД и pydantic при повторных запросах)
+response_cache = TTLCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+)
+
+# Версия каталога из общего кэша (один запрос к бэкенду) — входит в ключи локальных кэшей каталога,
+# поэтому изменение чая на любом воркере сразу делает устаревшими записи всех воркеров
+async def catalog_version() -> int:
+    [version] = await shared_cache.versions("catalog")
+    return version
+
+# Сброс кэша каталога — вызывается при любом изменении чая:
+# локальные кэши очищаются, версия каталога в общем кэше увеличивается для всех воркеров
+async def invalidate_catalog():
+    catalog_cache.clear()
+    response_cache.clear()
+    await shared_cache.bump("catalog")
+
+# Сброс закэшированного пользователя — вызывается при изменении или удалении
+async def invalidate_principal(user_id: int):
+    await shared_cache.delete(f"principal:{int(user_id)}")
+
+# Сброс закэшированных списков заказов пользователя
+async def invalidate_user_orders(user_id: int):
+    await shared_cache.bump(f"orders:{int(user_id)}")
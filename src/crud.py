@@ -1,25 +1,142 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from collections import Counter
+from sqlalchemy import and_, case, func, insert, or_, true, union_all, update
 from sqlalchemy.future import select
-from src import models, schemas
-from src.auth import hash_password,verify_password
+from sqlalchemy.orm import selectinload
+from src import models, rollups, rows, schemas
+from src.cache import MISSING, catalog_cache, catalog_version, invalidate_catalog, invalidate_principal, invalidate_user_orders
+from src.shared_cache import ORDERS_CACHE_TTL, TEA_CACHE_TTL, shared_cache
+from src.auth import hash_password_async
 
 # -------- Чай (Tea) -------- #
 
+# Чтения каталога идут через catalog_cache и возвращают снимки schemas.Tea,
+# а не ORM-объекты: их можно безопасно отдавать из кэша в разные сессии.
+# Ключи содержат общую версию каталога, поэтому записи устаревают сразу на всех воркерах
+
+# Колонки чая, нужные схеме ответа: списки каталога читают строки-кортежи без ORM-объектов
+TEA_COLUMNS = rows.TEA_COLUMNS
+
+def _teas_from_rows(result) -> list[schemas.Tea]:
+    return schemas.TeaList.validate_python([row._mapping for row in result])
+
+# Поля сортировки каталога (с "-" — по убыванию); id всегда добавляется вторым ключом
+TEA_SORT_FIELDS = {
+    "id": models.Tea.id,
+    "price": models.Tea.price,
+    "name": models.Tea.name,
+    "weight": models.Tea.weight,
+}
+
+def _tea_sort(filters: schemas.TeaFilter | None):
+    sort = filters.sort if filters else "id"
+    descending = sort.startswith("-")
+    return sort.lstrip("-"), descending
+
+# Фильтры каталога в SQL: тип, диапазоны цены и веса, наличие, поиск по названию
+def _filter_teas(query, filters: schemas.TeaFilter | None, dialect_name: str):
+    if filters is None:
+        return query
+    if filters.type is not None:
+        query = query.filter(models.Tea.type == filters.type)
+    if filters.min_price is not None:
+        query = query.filter(models.Tea.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(models.Tea.price <= filters.max_price)
+    if filters.min_weight is not None:
+        query = query.filter(models.Tea.weight >= filters.min_weight)
+    if filters.max_weight is not None:
+        query = query.filter(models.Tea.weight <= filters.max_weight)
+    if filters.in_stock_only:
+        query = query.filter(models.Tea.in_stock == true())
+    if filters.q:
+        escaped = filters.q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        if filters.match == "contains":
+            query = query.filter(models.Tea.name.ilike(f"%{escaped}%", escape="\\"))
+        elif dialect_name == "sqlite":
+            # LIKE в SQLite не учитывает регистр и идёт по индексу name COLLATE NOCASE
+            query = query.filter(models.Tea.name.like(f"{escaped}%", escape="\\"))
+        else:
+            # ILIKE не использует btree — префикс ищется по индексу lower(name) text_pattern_ops
+            query = query.filter(func.lower(models.Tea.name).like(f"{escaped}%".lower(), escape="\\"))
+    return query
+
+def _order_teas(query, filters: schemas.TeaFilter | None):
+    field, descending = _tea_sort(filters)
+    columns = [TEA_SORT_FIELDS[field]] if field != "id" else []
+    columns.append(models.Tea.id)
+    return query.order_by(*(column.desc() if descending else column for column in columns))
+
+def _filters_key(filters: schemas.TeaFilter | None):
+    return tuple(sorted(filters.model_dump().items())) if filters else ()
+
 #  получение списка всех чаев
-async def get_teas(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(models.Tea).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_teas(db: AsyncSession, skip: int = 0, limit: int = 10, filters: schemas.TeaFilter | None = None):
+    key = ("teas", await catalog_version(), skip, limit, _filters_key(filters))
+    teas = catalog_cache.get(key)
+    if teas is MISSING:
+        query = _order_teas(_filter_teas(select(*TEA_COLUMNS), filters, db.bind.dialect.name), filters)
+        result = await db.execute(query.offset(skip).limit(limit))
+        teas = _teas_from_rows(result)
+        catalog_cache.set(key, teas)
+    return list(teas)
+
+# keyset-пагинация чаев: строки после ключа (значение поля сортировки, id),
+# стоимость не зависит от глубины страницы
+async def get_teas_keyset(db: AsyncSession, after_id: int | None = None, limit: int = 10,
+                          filters: schemas.TeaFilter | None = None, after_value=None):
+    key = ("teas_keyset", await catalog_version(), after_id, after_value, limit, _filters_key(filters))
+    teas = catalog_cache.get(key)
+    if teas is MISSING:
+        query = _order_teas(_filter_teas(select(*TEA_COLUMNS), filters, db.bind.dialect.name), filters).limit(limit)
+        if after_id is not None:
+            field, descending = _tea_sort(filters)
+            column = TEA_SORT_FIELDS[field]
+            if field == "id":
+                condition = models.Tea.id < after_id if descending else models.Tea.id > after_id
+            elif descending:
+                condition = or_(column < after_value, and_(column == after_value, models.Tea.id < after_id))
+            else:
+                condition = or_(column > after_value, and_(column == after_value, models.Tea.id > after_id))
+            query = query.filter(condition)
+        result = await db.execute(query)
+        teas = _teas_from_rows(result)
+        catalog_cache.set(key, teas)
+    return list(teas)
+
+# Максимум id в одном пакетном запросе чаев
+TEA_BATCH_MAX_IDS = 500
+
+# Чаи по списку id одним запросом IN (...), в порядке запрошенных id
+async def get_teas_by_ids(db: AsyncSession, tea_ids: list[int]) -> list[schemas.Tea]:
+    if not tea_ids:
+        return []
+    result = await db.execute(select(*TEA_COLUMNS).filter(models.Tea.id.in_(tea_ids)))
+    by_id = {tea.id: tea for tea in _teas_from_rows(result)}
+    return [by_id[tea_id] for tea_id in tea_ids if tea_id in by_id]
+
+def _dump_tea(tea: schemas.Tea | None) -> bytes:
+    return b"null" if tea is None else tea.model_dump_json().encode()
 
-# получение одного чая по ID
+def _load_tea(raw: bytes) -> schemas.Tea | None:
+    return None if raw == b"null" else schemas.Tea.model_validate_json(raw)
+
+# получение одного чая по ID через общий кэш воркеров (отсутствие чая тоже кэшируется);
+# ключ содержит версию каталога, поэтому любое изменение чая делает старые записи недоступными
 async def get_tea(db: AsyncSession, tea_id: int):
-    result = await db.execute(select(models.Tea).filter(models.Tea.id == tea_id))
-    return result.scalar()
+    async def load():
+        result = await db.execute(select(models.Tea).filter(models.Tea.id == tea_id))
+        db_tea = result.scalar()
+        return schemas.Tea.model_validate(db_tea) if db_tea else None
+    version = await catalog_version()
+    return await shared_cache.get_or_load(f"tea:{version}:{tea_id}", load, TEA_CACHE_TTL, _dump_tea, _load_tea)
 
 #  создание нового чая
 async def create_tea(db: AsyncSession, tea: schemas.TeaCreate):
-    db_tea = models.Tea(**tea.dict())
+    db_tea = models.Tea(**tea.model_dump())
     db.add(db_tea)
     await db.commit()
+    await invalidate_catalog()
     await db.refresh(db_tea)
     return db_tea
 
@@ -28,9 +145,10 @@ async def update_tea(db: AsyncSession, tea_id: int, tea: schemas.TeaCreate):
     result = await db.execute(select(models.Tea).filter(models.Tea.id == tea_id))
     db_tea = result.scalar()
     if db_tea:
-        for key, value in tea.dict().items():
+        for key, value in tea.update_values(tracked=db_tea.stock is not None).items():
             setattr(db_tea, key, value)
         await db.commit()
+        await invalidate_catalog()
         await db.refresh(db_tea)
     return db_tea
 
@@ -41,15 +159,26 @@ async def delete_tea(db: AsyncSession, tea_id: int):
     if db_tea:
         await db.delete(db_tea)
         await db.commit()
+        await invalidate_catalog()
     return db_tea
 
 
 # -------- Пользователи (Users) -------- #
 
+# Списки пользователей — лёгкие строки rows.UserRow: только колонки схемы, без hashed_password
+
 #  получение списка всех пользователей
 async def get_users(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(models.User).offset(skip).limit(limit))
-    return result.scalars().all()
+    result = await db.execute(select(*rows.USER_COLUMNS).order_by(models.User.id).offset(skip).limit(limit))
+    return [rows.UserRow(*row) for row in result]
+
+# keyset-пагинация пользователей по id
+async def get_users_keyset(db: AsyncSession, after_id: int | None = None, limit: int = 10):
+    query = select(*rows.USER_COLUMNS).order_by(models.User.id).limit(limit)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    result = await db.execute(query)
+    return [rows.UserRow(*row) for row in result]
 
 #  получение одного пользователя по ID
 async def get_user(db: AsyncSession, user_id: int):
@@ -58,10 +187,11 @@ async def get_user(db: AsyncSession, user_id: int):
 
 #  создание нового пользователя
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_password = hash_password(user.password)  # Функция хеширования пароля
+    hashed_password = await hash_password_async(user.password)  # bcrypt в пуле, не в event loop
     db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     await db.commit()
+    await invalidate_principal(db_user.id)  # на случай, если id уже встречался в старом токене
     await db.refresh(db_user)
     return db_user
 # Получение пользователя по email
@@ -75,8 +205,9 @@ async def update_user(db: AsyncSession, user_id: int, user: schemas.UserCreate):
     if db_user:
         db_user.username = user.username
         db_user.email = user.email
-        db_user.hashed_password = hash_password(user.password)
+        db_user.hashed_password = await hash_password_async(user.password)
         await db.commit()
+        await invalidate_principal(user_id)
         await db.refresh(db_user)
     return db_user
 
@@ -87,60 +218,295 @@ async def delete_user(db: AsyncSession, user_id: int):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+        await invalidate_principal(user_id)
     return db_user
 
-# (заменить  на реальную реализацию)
-def hash_password(password: str) -> str:
-    return f"hashed_{password}"
-
 
 # -------- Заказы (Orders) -------- #
 
+# Опции eager-загрузки графа заказа для schemas.Order:
+# selectinload даёт один запрос на позиции и один на чай для всей страницы вместо N+1
+def order_graph_options():
+    return [selectinload(models.Order.items).selectinload(models.OrderItem.tea)]
+
+def _order_select(eager: bool = True):
+    query = select(models.Order)
+    if eager:
+        query = query.options(*order_graph_options())
+    return query
+
+# Списки заказов — лёгкие строки rows.OrderRow: один запрос на страницу заказов
+# и один на позиции вместе с чаем (JOIN) для всей страницы; eager=False — без позиций (сумма total есть и так).
+# Заказы пользователя читаются из горячей таблицы и архива сразу (UNION ALL), админские списки — только горячие
+def _order_rows_select():
+    return select(*rows.ORDER_COLUMNS)
+
+# Все заказы пользователя: горячие и архивные (id не пересекаются)
+def _user_orders(user_id: int, name: str = "user_orders"):
+    return union_all(
+        select(*rows.ORDER_COLUMNS).where(models.Order.user_id == user_id),
+        select(*rows.ARCHIVED_ORDER_COLUMNS).where(models.ArchivedOrder.user_id == user_id),
+    ).subquery(name)
+
+def _order_items_select(item_model, item_columns, order_ids):
+    return (
+        select(*item_columns, *(column.label(f"tea__{column.key}") for column in rows.TEA_COLUMNS))
+        .select_from(item_model)
+        .outerjoin(models.Tea, models.Tea.id == item_model.tea_id)
+        .where(item_model.order_id.in_(order_ids))
+    )
+
+async def _attach_order_items(db: AsyncSession, orders: list[rows.OrderRow], archived: bool = False):
+    by_id = {order.id: order for order in orders}
+    if not by_id:
+        return
+    query = _order_items_select(models.OrderItem, rows.ORDER_ITEM_COLUMNS, list(by_id))
+    if archived:
+        items = union_all(
+            query, _order_items_select(models.ArchivedOrderItem, rows.ARCHIVED_ORDER_ITEM_COLUMNS, list(by_id))
+        ).subquery()
+        query = select(items).order_by(items.c.id)
+    else:
+        query = query.order_by(models.OrderItem.id)
+    split = len(rows.ORDER_ITEM_COLUMNS)
+    for row in await db.execute(query):
+        tea = rows.TeaRow(*row[split:]) if row[split] is not None else None
+        item = rows.OrderItemRow(*row[:split], tea=tea)
+        by_id[item.order_id].items.append(item)
+
+async def _order_rows(db: AsyncSession, query, eager: bool = True, archived: bool = False) -> list[rows.OrderRow]:
+    result = await db.execute(query)
+    orders = [rows.OrderRow(*row) for row in result]
+    if eager:
+        await _attach_order_items(db, orders, archived)
+    return orders
+
 #  получение всех заказов (для администраторов)
-async def get_orders(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(models.Order).offset(skip).limit(limit))
-    return result.scalars().all()
-
-# получение всех заказов пользователя
-async def get_orders_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(models.Order).filter(models.Order.user_id == user_id).offset(skip).limit(limit))
-    return result.scalars().all()
-
-#  получение одного заказа по ID
-async def get_order(db: AsyncSession, order_id: int):
-    result = await db.execute(select(models.Order).filter(models.Order.id == order_id))
+async def get_orders(db: AsyncSession, skip: int = 0, limit: int = 10, eager: bool = True):
+    query = _order_rows_select().order_by(models.Order.id).offset(skip).limit(limit)
+    return await _order_rows(db, query, eager)
+
+# получение всех заказов пользователя (включая архивные)
+async def get_orders_by_user(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10, eager: bool = True):
+    orders = _user_orders(user_id)
+    query = select(orders).order_by(orders.c.id).offset(skip).limit(limit)
+    return await _order_rows(db, query, eager, archived=True)
+
+# Заказы для keyset-пагинации: сначала новые, ключ (created_at, id); columns — колонки таблицы или подзапроса,
+# cursor_source — отдельная копия того же источника для чтения created_at строки курсора.
+# Сравнение идёт с created_at в том виде, в каком оно хранится в БД: в SQLite дата — строка,
+# и значение по умолчанию (CURRENT_TIMESTAMP, без микросекунд) не равно параметру из курсора.
+# Дата из курсора используется, только если строки курсора уже нет
+def _orders_keyset_query(query, columns, cursor_source, after_created_at=None, after_id: int | None = None, limit: int = 10):
+    query = query.order_by(columns.created_at.desc(), columns.id.desc()).limit(limit)
+    if after_created_at is not None and after_id is not None:
+        cursor_created_at = func.coalesce(
+            select(cursor_source.c.created_at).where(cursor_source.c.id == after_id).scalar_subquery(),
+            after_created_at,
+        )
+        query = query.filter(or_(
+            columns.created_at < cursor_created_at,
+            and_(columns.created_at == cursor_created_at, columns.id < after_id),
+        ))
+    return query
+
+# keyset-пагинация заказов пользователя (включая архивные)
+async def get_orders_by_user_keyset(db: AsyncSession, user_id: int, after_created_at=None, after_id: int | None = None, limit: int = 10, eager: bool = True):
+    orders = _user_orders(user_id)
+    query = _orders_keyset_query(select(orders), orders.c, _user_orders(user_id, "cursor_order"), after_created_at, after_id, limit)
+    return await _order_rows(db, query, eager, archived=True)
+
+# Заказы пользователя через общий кэш: ключ содержит версии заказов пользователя и каталога
+async def get_orders_by_user_cached(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 10, eager: bool = True):
+    async def load():
+        orders = await get_orders_by_user(db, user_id=user_id, skip=skip, limit=limit, eager=eager)
+        return schemas.OrderList.validate_python(orders, from_attributes=True)
+    orders_version, catalog = await shared_cache.versions(f"orders:{user_id}", "catalog")
+    return await shared_cache.get_or_load(
+        f"orders:{user_id}:{orders_version}:{catalog}:{skip}:{limit}:{int(eager)}", load, ORDERS_CACHE_TTL,
+        schemas.OrderList.dump_json, schemas.OrderList.validate_json,
+    )
+
+#  получение одного заказа по ID (eager=False — только строка заказа, например для проверки владельца)
+async def get_order(db: AsyncSession, order_id: int, eager: bool = True):
+    result = await db.execute(_order_select(eager).filter(models.Order.id == order_id))
+    return result.scalar()
+
+# Заказ из архива по ID (только чтение; позиции и чай загружаются сразу)
+async def get_archived_order(db: AsyncSession, order_id: int):
+    result = await db.execute(
+        select(models.ArchivedOrder)
+        .options(selectinload(models.ArchivedOrder.items).selectinload(models.ArchivedOrderItem.tea))
+        .filter(models.ArchivedOrder.id == order_id)
+    )
     return result.scalar()
 
-#  создание нового заказа
+# Ошибка состава заказа: несуществующие или отсутствующие на складе чаи
+class InvalidOrderItems(Exception):
+    def __init__(self, missing: list[int], out_of_stock: list[int]):
+        self.missing = missing
+        self.out_of_stock = out_of_stock
+        super().__init__(f"missing tea ids: {missing}, out of stock: {out_of_stock}")
+
+def _order_quantities(items) -> Counter:
+    quantities = Counter()
+    for item in items:
+        quantities[item.tea_id] += item.quantity
+    return quantities
+
+# Проверка всех позиций одним запросом IN (...) вместо запроса на каждую позицию.
+# Тот же запрос читает цены для снимка unit_price. Возвращает цены по чаям
+# и количества по чаям с учётом остатка (stock не NULL) — их нужно зарезервировать
+async def _check_order_items(db: AsyncSession, items: list[schemas.OrderItemCreate]) -> tuple[dict[int, float], dict[int, int]]:
+    quantities = _order_quantities(items)
+    if not quantities:
+        return {}, {}
+    result = await db.execute(
+        select(models.Tea.id, models.Tea.in_stock, models.Tea.stock, models.Tea.price).filter(models.Tea.id.in_(quantities))
+    )
+    teas = {tea_id: (available, stock, price) for tea_id, available, stock, price in result.all()}
+    missing = sorted(quantities.keys() - teas.keys())
+    out_of_stock = sorted(
+        tea_id for tea_id, (available, stock, _) in teas.items()
+        if not available or (stock is not None and stock < quantities[tea_id])
+    )
+    if missing or out_of_stock:
+        raise InvalidOrderItems(missing=missing, out_of_stock=out_of_stock)
+    prices = {tea_id: price for tea_id, (_, _, price) in teas.items()}
+    return prices, {tea_id: quantities[tea_id] for tea_id, (_, stock, _) in teas.items() if stock is not None}
+
+# Количества только по чаям с учётом остатка (stock не NULL) — их и нужно резервировать
+async def _tracked_quantities(db: AsyncSession, quantities: dict[int, int]) -> dict[int, int]:
+    if not quantities:
+        return {}
+    result = await db.execute(
+        select(models.Tea.id).filter(models.Tea.id.in_(quantities), models.Tea.stock.is_not(None))
+    )
+    return {tea_id: quantities[tea_id] for tea_id in result.scalars()}
+
+# Резерв остатков всех позиций одним условным UPDATE:
+#   stock = stock - CASE id ... END WHERE id IN (...) AND stock >= CASE id ... END
+# Строки блокируются только до конца транзакции, поэтому UPDATE выполняется последним перед commit.
+# Не списанные чаи (остатка не хватило у конкурента) — InvalidOrderItems, транзакция откатывается
+async def _reserve_stock(db: AsyncSession, quantities: dict[int, int]) -> bool:
+    if not quantities:
+        return False
+    needed = case(quantities, value=models.Tea.id)
+    result = await db.execute(
+        update(models.Tea)
+        .where(models.Tea.id.in_(quantities), models.Tea.stock.is_not(None), models.Tea.stock >= needed)
+        .values(stock=models.Tea.stock - needed, in_stock=models.Tea.stock - needed > 0)
+        .returning(models.Tea.id, models.Tea.stock)
+        .execution_options(synchronize_session=False)
+    )
+    remaining = dict(result.all())
+    short = sorted(quantities.keys() - remaining.keys())
+    if short:
+        raise InvalidOrderItems(missing=[], out_of_stock=short)
+    return any(stock == 0 for stock in remaining.values())  # какой-то чай закончился
+
+# Возврат резерва (удаление или отмена заказа); чаи без учёта остатка не трогаются
+async def _release_stock(db: AsyncSession, quantities: dict[int, int]) -> bool:
+    if not quantities:
+        return False
+    returned = case(quantities, value=models.Tea.id)
+    result = await db.execute(
+        update(models.Tea)
+        .where(models.Tea.id.in_(quantities), models.Tea.stock.is_not(None))
+        .values(stock=models.Tea.stock + returned, in_stock=True)
+        .returning(models.Tea.id, models.Tea.stock)
+        .execution_options(synchronize_session=False)
+    )
+    return any(stock == quantities[tea_id] for tea_id, stock in result.all())  # чай снова появился
+
+#  создание нового заказа — одна транзакция: проверка позиций, заказ, все позиции одним INSERT, резерв остатков.
+# Цены позиций (unit_price) и сумма заказа (total) фиксируются из того же запроса проверки,
+# поэтому заказ пишется без дополнительных обращений к БД, а сумма не меняется вместе с Tea.price
 async def create_order(db: AsyncSession, order: schemas.OrderCreate, user_id: int):
-    db_order = models.Order(user_id=user_id, status=order.status)
-    db.add(db_order)
-    await db.commit()
-    await db.refresh(db_order)
-    
-    # Добавление товаров (позиций) в заказ
-    for item in order.items:
-        db_item = models.OrderItem(order_id=db_order.id, tea_id=item.tea_id, quantity=item.quantity)
-        db.add(db_item)
-    
-    await db.commit()
-    return db_order
+    try:
+        prices, quantities = await _check_order_items(db, order.items)
+        total = round(sum(prices[item.tea_id] * item.quantity for item in order.items), 2)
+        db_order = models.Order(user_id=user_id, status=order.status, total=total)
+        db.add(db_order)
+        await db.flush()  # получаем id заказа без коммита
+
+        if order.items:
+            await db.execute(insert(models.OrderItem).values([
+                {"order_id": db_order.id, "tea_id": item.tea_id, "quantity": item.quantity,
+                 "unit_price": prices[item.tea_id]}
+                for item in order.items
+            ]))
+        sold_out = order.status != models.ORDER_CANCELLED and await _reserve_stock(db, quantities)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    if sold_out:
+        await invalidate_catalog()
+    await invalidate_user_orders(user_id)
+    # Перечитываем заказ вместе с позициями и чаем для сериализации ответа
+    return await get_order(db, db_order.id)
 
-#  обновление заказа
+#  обновление заказа: отмена снимает резерв, возврат из отмены резервирует заново.
+# Статус меняется условным UPDATE (WHERE status = прежний), чтобы при гонке резерв не снялся дважды
 async def update_order(db: AsyncSession, order_id: int, order: schemas.OrderCreate):
-    result = await db.execute(select(models.Order).filter(models.Order.id == order_id))
-    db_order = result.scalar()
+    db_order = await get_order(db, order_id)
     if db_order:
-        db_order.status = order.status
-        await db.commit()
-        await db.refresh(db_order)
+        previous = db_order.status
+        catalog_changed = False
+        try:
+            result = await db.execute(
+                update(models.Order)
+                .where(models.Order.id == order_id, models.Order.status == previous)
+                .values(status=order.status)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1 and (previous == models.ORDER_CANCELLED) != (order.status == models.ORDER_CANCELLED):
+                quantities = dict(_order_quantities(db_order.items))
+                if order.status == models.ORDER_CANCELLED:
+                    catalog_changed = await _release_stock(db, quantities)
+                else:
+                    catalog_changed = await _reserve_stock(db, await _tracked_quantities(db, quantities))
+            # уже учтённый в агрегатах заказ переносится из прежнего статуса в новый
+            if result.rowcount == 1 and previous != order.status and await rollups.is_counted(db, order_id):
+                await rollups.apply_orders(db, [models.Order.id == order_id], -1, status=previous or "")
+                await rollups.apply_orders(db, [models.Order.id == order_id], 1)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        if catalog_changed:
+            await invalidate_catalog()
+        await invalidate_user_orders(db_order.user_id)
+        await db.refresh(db_order, attribute_names=["status"])
     return db_order
 
-# удаление заказа
+# удаление заказа (позиции удаляются каскадом, резерв незавершённого заказа возвращается,
+# вклад в агрегаты продаж вычитается)
 async def delete_order(db: AsyncSession, order_id: int):
-    result = await db.execute(select(models.Order).filter(models.Order.id == order_id))
-    db_order = result.scalar()
+    db_order = await get_order(db, order_id)
     if db_order:
-        await db.delete(db_order)
-        await db.commit()
+        catalog_changed = False
+        try:
+            # строка блокируется до конца транзакции: статус для возврата резерва и агрегатов — актуальный,
+            # а параллельное удаление или отмена ждут и не вернут резерв дважды
+            locked = (await db.execute(
+                select(models.Order.status).where(models.Order.id == order_id).with_for_update()
+            )).first()
+            if locked is None:  # заказ уже удалён параллельным запросом
+                await db.rollback()
+                return db_order
+            if await rollups.is_counted(db, order_id):
+                await rollups.apply_orders(db, [models.Order.id == order_id], -1)
+            await db.delete(db_order)
+            await db.flush()
+            if locked.status != models.ORDER_CANCELLED:
+                catalog_changed = await _release_stock(db, dict(_order_quantities(db_order.items)))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        if catalog_changed:
+            await invalidate_catalog()
+        await invalidate_user_orders(db_order.user_id)
     return db_order
@@ -1,9 +1,111 @@
-from src.base import AsyncSessionLocal, create_db_and_tables
-
-# Dependency для получения асинхронной сессии
-async def get_db():
-    async with AsyncSessionLocal() as db:
-        try:
-            yield db
-        finally:
-            await db.close()
+import functools
+import inspect
+import os
+from contextvars import ContextVar
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from src.base import AsyncSessionLocal, AsyncReadSessionLocal, create_db_and_tables, engine, read_engine
+from src.auth import decode_access_token
+from src.cache import TTLCache
+
+# Сколько секунд после своей записи пользователь читает из основной БД (read-your-writes)
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+
+# Пользователи, недавно писавшие в основную БД
+_sticky_writers = TTLCache(maxsize=100000, ttl=READ_STICKY_SECONDS)
+
+# Ключ «липкости» — id пользователя из Bearer-токена (анонимные запросы не липнут)
+def _sticky_key(request: Request):
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return decode_access_token(token)
+
+# Отмечаем пользователя сразу при коммите, чтобы следующий GET уже шёл в основную БД
+@event.listens_for(Session, "after_commit")
+def _mark_sticky_writer(session):
+    key = session.info.get("sticky_key")
+    if key is not None:
+        _sticky_writers.set(key, True)
+
+# -------- Сессия запроса (unit of work) -------- #
+# Одна сессия на запрос для каждой БД: её получают get_current_user, get_current_admin и обработчик.
+# Соединение из пула берётся только при первом запросе к БД (сессия ленивая) и возвращается
+# сразу после выхода из обработчика — до сериализации ответа. Маршруты с такими зависимостями
+# объявляются в роутерах с route_class=UnitOfWorkRoute
+
+_request_sessions: ContextVar[dict | None] = ContextVar("request_sessions", default=None)
+
+def _request_session(session_factory, sticky_key=None) -> AsyncSession:
+    sessions = _request_sessions.get()
+    if sessions is None:
+        raise RuntimeError("Database dependencies require a router with route_class=UnitOfWorkRoute")
+    db = sessions.get(session_factory)
+    if db is None:
+        db = sessions[session_factory] = session_factory()
+        if session_factory is AsyncSessionLocal and read_engine is not engine:
+            db.info["sticky_key"] = sticky_key
+    return db
+
+# Закрытие сессий запроса: незакоммиченное откатывается, соединения возвращаются в пул.
+# Загруженные объекты остаются доступны для сериализации (expire_on_commit=False)
+async def _close_request_sessions():
+    sessions = _request_sessions.get()
+    while sessions:
+        _, db = sessions.popitem()
+        await db.close()
+
+# Маршрут, который открывает unit of work на время запроса и закрывает его сразу после обработчика
+class UnitOfWorkRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        # синхронные обработчики выполняются в пуле потоков — их сессии закрываются в get_route_handler
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = self._close_sessions_after(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _close_sessions_after(endpoint):
+        @functools.wraps(endpoint)
+        async def endpoint_in_unit_of_work(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                await _close_request_sessions()
+        return endpoint_in_unit_of_work
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request):
+            token = _request_sessions.set({})
+            try:
+                return await handler(request)
+            finally:
+                # обработчик не дошёл до конца (ошибка в зависимостях или исключение)
+                await _close_request_sessions()
+                _request_sessions.reset(token)
+        return unit_of_work_handler
+
+# Dependency для получения сессии основной БД
+async def get_db(request: Request) -> AsyncSession:
+    return _request_session(AsyncSessionLocal, _sticky_key(request) if read_engine is not engine else None)
+
+# Dependency для GET-запросов: сессия реплики, либо основной БД сразу после записи пользователя
+async def get_read_db(request: Request) -> AsyncSession:
+    if read_engine is engine:
+        return _request_session(AsyncSessionLocal)
+    key = _sticky_key(request)
+    if key is not None and _sticky_writers.get(key, None):
+        return _request_session(AsyncSessionLocal, key)
+    return _request_session(AsyncReadSessionLocal)
+
+# Dependency для общих зависимостей (текущий пользователь): GET читает с реплики,
+# остальные методы — из основной БД, в той же сессии, что и обработчик
+async def get_request_db(request: Request) -> AsyncSession:
+    if request.method in ("GET", "HEAD"):
+        return await get_read_db(request)
+    return await get_db(request)
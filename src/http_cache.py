@@ -0,0 +1,31 @@
+import hashlib
+import os
+from fastapi import Request, Response
+from pydantic_core import to_json
+from src.cache import MISSING, catalog_version, response_cache
+
+# Сколько секунд клиент может не перепроверять каталог
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "10"))
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+# Ответ каталога с ETag и Cache-Control: байты берутся из response_cache по (общая версия каталога, URL),
+# при совпадении If-None-Match отдаётся 304 без тела
+async def catalog_response(request: Request, produce) -> Response:
+    key = (await catalog_version(), request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = response_cache.get(key)
+    if entry is MISSING:
+        # pydantic-модели сериализуются сразу в байты, без промежуточных dict
+        body = to_json(await produce())
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        entry = (body, etag)
+        response_cache.set(key, entry)
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CATALOG_MAX_AGE}"}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
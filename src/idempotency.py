@@ -0,0 +1,64 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Optional
+from fastapi import Header, HTTPException, Request, Response
+from src.shared_cache import shared_cache
+
+# Сколько хранится ответ для повтора (секунды)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Блокировка на время первого выполнения и сколько дубликат ждёт его результат
+IDEMPOTENCY_LOCK_TTL = float(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "10"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Заголовок Idempotency-Key (необязательный)
+async def idempotency_key(key: Optional[str] = Header(None, alias="Idempotency-Key")) -> Optional[str]:
+    if key is not None and not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+    return key
+
+def _replay(stored: bytes, fingerprint: bytes) -> Response:
+    stored_fingerprint, _, body = stored.partition(b"\n")
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return Response(content=body, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+# Выполнение запроса не более одного раза на ключ: ответ первого успешного выполнения
+# сохраняется в общем кэше (IDEMPOTENCY_TTL) и отдаётся повторам без обращения к БД.
+# Одновременный дубликат ждёт результат первого, ключ с другим телом запроса — 422.
+# Неуспешное выполнение (исключение) не сохраняется: повтор, в том числе ожидающий дубликат, выполнится заново.
+# С бэкендом memory:// повторы распознаются в пределах одного воркера, для нескольких нужен redis://
+async def run_idempotent(request: Request, scope: str, key: Optional[str], execute, serialize) -> Response:
+    if key is None:
+        return Response(content=serialize(await execute()), media_type="application/json")
+
+    fingerprint = hashlib.sha256(request.method.encode() + request.url.path.encode() + await request.body()).hexdigest().encode()
+    cache_key = f"idempotency:{scope}:{hashlib.sha256(key.encode()).hexdigest()}"
+    stored = await shared_cache.get(cache_key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    lock_key = f"{cache_key}:lock"
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    # Блокировку держит первое выполнение — ждём его результат. Если она снята, а результата нет
+    # (первое выполнение завершилось ошибкой), следующая попытка захватит её и выполнит запрос сама
+    while not await shared_cache.add(lock_key, b"1", IDEMPOTENCY_LOCK_TTL):
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(0.05)
+        stored = await shared_cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+    try:
+        # первый мог завершиться между чтением результата и захватом блокировки
+        stored = await shared_cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+        body = serialize(await execute())
+        await shared_cache.set(cache_key, fingerprint + b"\n" + body, IDEMPOTENCY_TTL)
+        return Response(content=body, media_type="application/json")
+    finally:
+        await shared_cache.delete(lock_key)
@@ -1,7 +1,13 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from src.routers import tea, users, orders
 from src.databases import create_db_and_tables
-from src.admin import users as admin_users, tea as admin_tea 
+from src.base import check_database_dialect
+from src.auth import PasswordHasherBusy, shutdown_password_pool
+from src.metrics import MetricsMiddleware, render_metrics
+from src.admin import users as admin_users, tea as admin_tea, db as admin_db, orders as admin_orders, analytics as admin_analytics
+from src.rollups import ROLLUP_INTERVAL, run_periodically
 from fastapi.staticfiles import StaticFiles
 import os
 from dotenv import load_dotenv
@@ -12,7 +18,7 @@ from dotenv import load_dotenv
 app = FastAPI(
     title="Tea Shop API",
     description="API для управления магазином чаев",
-    version="1.0.0"
+    version="1.0.0",
 )
 
 #  из .env
@@ -23,17 +29,44 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 SECRET_KEY = os.getenv("SECRET_KEY")
 
 
+# Метрики: латентность маршрутов, запросы к БД на запрос, медленные запросы, пул
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(tea.router, prefix="/tea", tags=["Tea"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(orders.router, prefix="/orders", tags=["Orders"])
 
 app.include_router(admin_users.router, prefix="/admin/users", tags=["Admin Users"])
 app.include_router(admin_tea.router, prefix="/admin/tea", tags=["Admin Tea"])
+app.include_router(admin_orders.router, prefix="/admin/orders", tags=["Admin Orders"])
+app.include_router(admin_db.router, prefix="/admin/db", tags=["Admin DB"])
+app.include_router(admin_analytics.router, prefix="/admin/analytics", tags=["Admin Analytics"])
 # старт 
 @app.on_event("startup")
 async def on_startup():
-   
+    check_database_dialect()
     await create_db_and_tables()
+    # фоновое догоняющее задание агрегатов продаж
+    if ROLLUP_INTERVAL > 0:
+        app.state.rollup_task = asyncio.create_task(run_periodically(ROLLUP_INTERVAL))
+
+# остановка
+@app.on_event("shutdown")
+async def on_shutdown():
+    rollup_task = getattr(app.state, "rollup_task", None)
+    if rollup_task is not None:
+        rollup_task.cancel()
+    shutdown_password_pool()
+
+# Пул bcrypt переполнен — просим клиента повторить позже
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(status_code=503, content={"detail": "Authentication is busy, retry later"}, headers={"Retry-After": "1"})
+
+# Метрики в формате Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Пример корневого маршрута
 @app.get("/")
@@ -0,0 +1,207 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from fastapi.routing import iter_route_contexts
+from src.base import engine, read_engine, pool_stats
+from src.cache import catalog_cache
+from src.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Порог медленного запроса к БД (мс) для лога и счётчика
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# -------- Метрики в формате Prometheus (без внешних зависимостей) -------- #
+
+def _format_labels(labels: tuple, names: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, labels))
+    return "{" + pairs + "}"
+
+# Счётчик с метками
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(labels, self.labels)} {value}")
+        return lines
+
+# Гистограмма с метками и фиксированными корзинами
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (bucket_counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + (bound,), self.labels + ("le",))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + ('+Inf',), self.labels + ('le',))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels, self.labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels, self.labels)} {count}")
+        return lines
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency", ("method", "route"))
+REQUESTS = Counter("http_requests_total", "Requests by status", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL queries per request", ("method", "route"), QUERY_COUNT_BUCKETS)
+REQUEST_PHASES = Counter(
+    "http_request_phase_seconds_total",
+    "Time per request phase: db, bcrypt, app (handler and serialization)",
+    ("route", "phase"),
+)
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency")
+SLOW_QUERIES = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS")
+
+# -------- Учёт в пределах одного запроса -------- #
+
+class RequestStats:
+    __slots__ = ("queries", "phases")
+
+    def __init__(self):
+        self.queries = 0
+        self.phases: dict[str, float] = {}
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+# Время фазы (например, bcrypt) внутри текущего запроса
+def observe_phase(phase: str, seconds: float):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.phases[phase] = stats.phases.get(phase, 0.0) + seconds
+
+# -------- События SQLAlchemy -------- #
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_LATENCY.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.phases["db"] = stats.phases.get("db", 0.0) + elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning("slow query %.1f ms: %s", elapsed * 1000, statement)
+
+def instrument_engine(db_engine):
+    sync_engine = db_engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+
+# -------- ASGI middleware -------- #
+
+# Полные шаблоны маршрутов с префиксами include_router: id исходного маршрута -> путь
+_route_paths: dict[int, str] = {}
+
+# Шаблон маршрута (/tea/{tea_id}), а не сырой путь — чтобы не плодить метки.
+# Маршрут берётся из scope["route"] после обработки запроса; include_router его не копирует,
+# и его path — без префикса роутера, поэтому полный путь ищется среди маршрутов приложения
+def _route_template(app, scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = _route_paths.get(id(route))
+    if path is None:
+        for context in iter_route_contexts(getattr(app, "routes", [])):
+            _route_paths.setdefault(id(context.original_route), context.path)
+        path = _route_paths.setdefault(id(route), getattr(route, "path", "unknown"))
+    return path
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            method = scope["method"]
+            route = _route_template(scope.get("app"), scope)
+            REQUEST_LATENCY.observe(elapsed, method, route)
+            REQUESTS.inc(method, route, status_code)
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            for phase, seconds in stats.phases.items():
+                REQUEST_PHASES.inc(route, phase, amount=seconds)
+            REQUEST_PHASES.inc(route, "app", amount=max(0.0, elapsed - sum(stats.phases.values())))
+
+# -------- Экспорт -------- #
+
+def _pool_lines(name: str, db_engine) -> list[str]:
+    stats = pool_stats(db_engine)
+    lines = []
+    for key in ("size", "checked_out", "overflow", "checkouts", "avg_wait_ms", "max_wait_ms"):
+        if key in stats:
+            lines.append(f'db_pool_{key}{{engine="{name}"}} {stats[key]}')
+    return lines
+
+def _cache_lines() -> list[str]:
+    lines = []
+    catalog = catalog_cache.stats()
+    for key in ("hits", "misses", "evictions", "size"):
+        lines.append(f'cache_{key}{{cache="catalog"}} {catalog[key]}')
+    shared = shared_cache.stats()
+    for key in ("hits", "misses", "errors"):
+        lines.append(f'cache_{key}{{cache="shared"}} {shared[key]}')
+    return lines
+
+# Все метрики в текстовом формате Prometheus
+def render_metrics() -> str:
+    lines = []
+    for metric in (REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, REQUEST_PHASES, QUERY_LATENCY, SLOW_QUERIES):
+        lines.extend(metric.render())
+    lines.extend(_pool_lines("primary", engine))
+    if read_engine is not engine:
+        lines.extend(_pool_lines("replica", read_engine))
+    lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
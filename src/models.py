@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Index, collate
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from src.base import Base
+from src.base import Base, pg_trgm_available
 
 # Модель для товаров (Чай)
 class Tea(Base):
@@ -14,42 +14,149 @@ class Tea(Base):
     type = Column(String, nullable=False)
     weight = Column(Float, nullable=False)
     in_stock = Column(Boolean, default=True)
+    stock = Column(Integer, nullable=True)  # остаток на складе; NULL — количество не учитывается
+    sku = Column(String, nullable=True)  # артикул поставщика — ключ для массового импорта
 
     orders = relationship("OrderItem", back_populates="tea")
 
+    # Индексы под фильтры каталога: тип + цена, наличие + цена, сортировка по названию.
+    # Поиск по префиксу названия без учёта регистра: в PostgreSQL — lower(name) text_pattern_ops
+    # (для lower(name) LIKE 'abc%'), в SQLite — name COLLATE NOCASE (для name LIKE 'abc%').
+    # В PostgreSQL дополнительно триграммный GIN-индекс для поиска подстроки (если доступен pg_trgm)
+    __table_args__ = (
+        Index("ix_tea_type_price", "type", "price"),
+        Index("ix_tea_in_stock_price", "in_stock", "price"),
+        Index("ix_tea_name", "name"),
+        Index("ix_tea_sku", "sku", unique=True),
+        Index(
+            "ix_tea_name_lower_prefix", func.lower(name).label("name_lower"),
+            postgresql_ops={"name_lower": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index("ix_tea_name_nocase", collate(name, "NOCASE")).ddl_if(dialect="sqlite"),
+        Index(
+            "ix_tea_name_trgm", "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql", callable_=pg_trgm_available),
+    )
+
 # Модель для пользователей
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False)
-    email = Column(String, unique=True, nullable=False)
+    email = Column(String, unique=True, nullable=False)  # уникальное ограничение уже даёт индекс для входа
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
 
     orders = relationship("Order", back_populates="user")
 
+# Статус отменённого заказа: резерв остатков снят, в продажи не входит
+ORDER_CANCELLED = "cancelled"
+
 # Модель для заказов
 class Order(Base):
     __tablename__ = "orders"
+    # id только растут и не переиспользуются после удаления (в SQLite без AUTOINCREMENT
+    # берётся max(rowid) + 1): на этом держатся водяной знак агрегатов и архив заказов
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, default="pending")
+    total = Column(Float, nullable=True)  # сумма заказа по ценам на момент оформления
 
     user = relationship("User", back_populates="orders")
-    items = relationship("OrderItem", back_populates="order")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+
+# История заказов пользователя: WHERE user_id = ? ORDER BY created_at DESC.
+# Индекс покрывает и сам внешний ключ user_id, отдельный индекс по user_id не нужен
+Index("ix_orders_user_id_created_at", Order.user_id, Order.created_at.desc())
 
 # Модель для позиций заказа
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = {"sqlite_autoincrement": True}  # id позиций тоже переносятся в архив
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    tea_id = Column(Integer, ForeignKey("tea.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    tea_id = Column(Integer, ForeignKey("tea.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=True)  # цена чая на момент заказа (не меняется вместе с Tea.price)
 
     order = relationship("Order", back_populates="items")
     tea = relationship("Tea", back_populates="orders")
+
+
+# -------- Архив заказов -------- #
+# Старые заказы в конечном статусе переносятся сюда заданием src/archive.py,
+# чтобы таблицы orders и order_items (и их индексы) не росли бесконечно.
+# Колонки совпадают с горячими таблицами, id заказов и позиций сохраняются
+
+# Конечные статусы: такие заказы больше не меняются и могут уйти в архив
+ORDER_TERMINAL_STATUSES = (ORDER_CANCELLED, "delivered")
+
+class ArchivedOrder(Base):
+    __tablename__ = "orders_archive"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    status = Column(String)
+    total = Column(Float, nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    items = relationship("ArchivedOrderItem", order_by="ArchivedOrderItem.id")
+
+Index("ix_orders_archive_user_id_created_at", ArchivedOrder.user_id, ArchivedOrder.created_at.desc())
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "order_items_archive"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders_archive.id"), nullable=False, index=True)
+    tea_id = Column(Integer, nullable=False)  # без внешнего ключа: чай мог быть удалён
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=True)
+
+    tea = relationship("Tea", primaryjoin="foreign(ArchivedOrderItem.tea_id) == Tea.id", viewonly=True)
+
+# -------- Дневные агрегаты продаж (аналитика в админке) -------- #
+# Счётчики аддитивные: задание догоняет новые заказы по водяному знаку,
+# отмена и удаление уже учтённых заказов вычитают свой вклад (src/rollups.py)
+
+# Проданные единицы и выручка по чаю за день (без отменённых заказов)
+class SalesDailyTea(Base):
+    __tablename__ = "sales_daily_tea"
+
+    day = Column(Date, primary_key=True)
+    tea_id = Column(Integer, primary_key=True)  # без внешнего ключа: история остаётся после удаления чая
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+# Заказы и их сумма по статусу за день
+class SalesDailyStatus(Base):
+    __tablename__ = "sales_daily_status"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)  # пустая строка — заказ без статуса
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+# Покупатели за день: строка с orders > 0 — активный покупатель
+class SalesDailyBuyer(Base):
+    __tablename__ = "sales_daily_buyers"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+
+# Водяной знак: id последнего заказа, учтённого в агрегатах
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,43 @@
+import base64
+import json
+from datetime import datetime
+
+# Курсор — непрозрачная строка (base64 от JSON с ключом последней строки страницы)
+
+# Кодирование ключа последней строки в курсор
+def encode_cursor(key: dict) -> str:
+    raw = json.dumps(key, separators=(",", ":"), default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# Декодирование курсора; пустая строка означает первую страницу
+def decode_cursor(cursor: str | None) -> dict:
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+# Курсор следующей страницы (None, если страница неполная и дальше ничего нет)
+def next_cursor(items, limit: int, key_fn) -> str | None:
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(key_fn(items[-1]))
+
+# Разбор даты из курсора заказов
+def parse_datetime(value) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Unsupported cursor value: {value!r}")
@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from src.base import engine as default_engine
+
+# Счётчик SQL-запросов (round trip'ов) через событие before_cursor_execute движка
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+# Подсчёт запросов внутри блока:
+#     with count_queries() as counter:
+#         await crud.get_orders_by_user(db, user_id=1, limit=100)
+#     print(counter.count)
+@contextmanager
+def count_queries(engine=None):
+    sync_engine = getattr(engine or default_engine, "sync_engine", engine or default_engine)
+    counter = QueryCounter()
+    event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter)
+
+# Проверка, что блок уложился в заданное число запросов (защита от регрессий N+1)
+@contextmanager
+def assert_max_queries(expected: int, engine=None):
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        executed = "\n".join(counter.statements)
+        raise AssertionError(f"Expected at most {expected} queries, got {counter.count}:\n{executed}")
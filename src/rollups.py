@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import String, cast, func, literal, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from src import models
+from src.base import UPSERT_INSERTS, AsyncSessionLocal, check_database_dialect
+
+logger = logging.getLogger(__name__)
+
+# Период фонового догоняющего задания (секунды, 0 — выключено) и размер порции заказов
+ROLLUP_INTERVAL = float(os.getenv("ROLLUP_INTERVAL", "60"))
+ROLLUP_BATCH = int(os.getenv("ROLLUP_BATCH", "5000"))
+# Заказы моложе этого возраста не учитываются: транзакция с меньшим id может быть ещё не закоммичена
+ROLLUP_LAG_SECONDS = float(os.getenv("ROLLUP_LAG_SECONDS", "30"))
+
+ORDERS_WATERMARK = "orders"
+
+# -------- Запись агрегатов -------- #
+
+# INSERT ... SELECT ... ON CONFLICT DO UPDATE: счётчики прибавляются к существующей строке дня
+# (диалект проверен при старте — check_database_dialect)
+async def _accumulate(db: AsyncSession, table, query, keys: list[str], counters: list[str]):
+    statement = UPSERT_INSERTS[db.bind.dialect.name](table).from_select(keys + counters, query)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: table.c[name] + statement.excluded[name] for name in counters},
+    )
+    await db.execute(statement)
+
+# Добавление (sign=1) или вычитание (sign=-1) вклада заказов, отобранных условиями filters.
+# status — статус, с которым заказы учитываются, если он уже изменён в этой транзакции
+# ("" — заказ без статуса); по умолчанию берётся текущий статус из строки заказа
+async def apply_orders(db: AsyncSession, filters: list, sign: int, status: str | None = None):
+    day = func.date(models.Order.created_at)
+    if status is None:
+        order_status = func.coalesce(models.Order.status, "")
+        status_groups, sold = [order_status], [order_status != models.ORDER_CANCELLED]
+    else:
+        order_status = cast(literal(status), String)
+        status_groups, sold = [], []
+
+    await _accumulate(db, models.SalesDailyStatus.__table__, (
+        select(day, order_status, func.count(models.Order.id) * sign,
+               func.sum(func.coalesce(models.Order.total, 0.0)) * sign)
+        .where(*filters)
+        .group_by(day, *status_groups)
+    ), ["day", "status"], ["orders", "revenue"])
+
+    await _accumulate(db, models.SalesDailyBuyer.__table__, (
+        select(day, models.Order.user_id, func.count(models.Order.id) * sign)
+        .where(*filters)
+        .group_by(day, models.Order.user_id)
+    ), ["day", "user_id"], ["orders"])
+
+    if status == models.ORDER_CANCELLED:
+        return
+    await _accumulate(db, models.SalesDailyTea.__table__, (
+        select(day, models.OrderItem.tea_id, func.sum(models.OrderItem.quantity) * sign,
+               func.sum(models.OrderItem.quantity * func.coalesce(models.OrderItem.unit_price, 0.0)) * sign)
+        .select_from(models.Order)
+        .join(models.OrderItem, models.OrderItem.order_id == models.Order.id)
+        .where(*filters, *sold)
+        .group_by(day, models.OrderItem.tea_id)
+    ), ["day", "tea_id"], ["units", "revenue"])
+
+# Учтён ли заказ в агрегатах. Водяной знак читается с FOR SHARE: пока догоняющее задание
+# держит его FOR UPDATE, изменение заказа ждёт, и вклад не теряется и не считается дважды
+async def is_counted(db: AsyncSession, order_id: int) -> bool:
+    result = await db.execute(
+        select(models.RollupWatermark.last_id)
+        .where(models.RollupWatermark.name == ORDERS_WATERMARK)
+        .with_for_update(read=True)
+    )
+    last_id = result.scalar()
+    return last_id is not None and order_id <= last_id
+
+# -------- Догоняющее задание -------- #
+
+async def _lock_watermark(db: AsyncSession) -> int:
+    query = select(models.RollupWatermark.last_id).where(models.RollupWatermark.name == ORDERS_WATERMARK).with_for_update()
+    last_id = (await db.execute(query)).scalar()
+    if last_id is None:
+        await db.execute(
+            UPSERT_INSERTS[db.bind.dialect.name](models.RollupWatermark)
+            .values(name=ORDERS_WATERMARK, last_id=0)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        last_id = (await db.execute(query)).scalar()
+    return last_id
+
+# Учёт заказов с id больше водяного знака, порциями по batch_size (каждая — своя транзакция).
+# Стоимость зависит только от числа новых заказов, а не от всей истории
+async def catch_up(db: AsyncSession, batch_size: int = ROLLUP_BATCH) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ROLLUP_LAG_SECONDS)
+    processed = 0
+    try:
+        while True:
+            last_id = await _lock_watermark(db)
+            result = await db.execute(
+                select(models.Order.id)
+                .where(models.Order.id > last_id, models.Order.created_at < cutoff)
+                .order_by(models.Order.id)
+                .limit(batch_size)
+            )
+            order_ids = result.scalars().all()
+            if not order_ids:
+                await db.commit()
+                return processed
+            await apply_orders(db, [models.Order.id > last_id, models.Order.id <= order_ids[-1]], 1)
+            await db.execute(
+                update(models.RollupWatermark)
+                .where(models.RollupWatermark.name == ORDERS_WATERMARK)
+                .values(last_id=order_ids[-1])
+            )
+            await db.commit()
+            processed += len(order_ids)
+    except Exception:
+        await db.rollback()
+        raise
+
+# Фоновый цикл в приложении; несколько воркеров безопасны — водяной знак блокируется
+async def run_periodically(interval: float = ROLLUP_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                processed = await catch_up(db)
+            if processed:
+                logger.info("sales rollups: %d new orders", processed)
+        except Exception:
+            logger.exception("sales rollups catch-up failed")
+
+# python -m src.rollups — разовый прогон (например, из cron)
+if __name__ == "__main__":
+    async def main():
+        check_database_dialect()
+        async with AsyncSessionLocal() as db:
+            print(f"processed {await catch_up(db)} orders")
+    asyncio.run(main())
@@ -1,42 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from src import crud, schemas
-from src.databases import get_db
+from src import crud, schemas, pagination
+from src.databases import UnitOfWorkRoute, get_db, get_read_db
+from src.idempotency import idempotency_key, run_idempotent
 from src.routers.users import get_current_user
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 # Получение списка всех заказов для текущего пользователя
-@router.get("/", response_model=list[schemas.Order])
-async def read_orders(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    orders = await crud.get_orders_by_user(db=db, user_id=current_user.id, skip=skip, limit=limit)
-    return orders
+# Без cursor — offset-пагинация; с cursor — keyset-страница (сначала новые, ключ created_at + id).
+# include_items=false — только заказы с суммой total, без загрузки позиций
+@router.get("/", response_model=Union[list[schemas.Order], schemas.OrderPage])
+async def read_orders(skip: int = 0, limit: int = 10, cursor: Optional[str] = None, include_items: bool = True,
+                      db: AsyncSession = Depends(get_read_db), current_user: schemas.User = Depends(get_current_user)):
+    if cursor is None:
+        return await crud.get_orders_by_user_cached(db=db, user_id=current_user.id, skip=skip, limit=limit, eager=include_items)
+    try:
+        key = pagination.decode_cursor(cursor)
+        after_created_at = pagination.parse_datetime(key.get("created_at"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    orders = await crud.get_orders_by_user_keyset(
+        db=db, user_id=current_user.id, after_created_at=after_created_at, after_id=key.get("id"), limit=limit,
+        eager=include_items,
+    )
+    return {
+        "items": orders,
+        "next_cursor": pagination.next_cursor(orders, limit, lambda order: {"created_at": order.created_at, "id": order.id}),
+    }
 
-# Получение одного заказа по ID
+# Получение одного заказа по ID (если его нет среди текущих — ищется в архиве)
 @router.get("/{order_id}", response_model=schemas.Order)
-async def read_order(order_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
+async def read_order(order_id: int, db: AsyncSession = Depends(get_read_db), current_user: schemas.User = Depends(get_current_user)):
     order = await crud.get_order(db=db, order_id=order_id)
+    if order is None:
+        order = await crud.get_archived_order(db=db, order_id=order_id)
     if order is None or order.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Order not found or not authorized")
     return order
 
-# Создание нового заказа
+# Текущий заказ пользователя для изменения; архивные заказы только читаются — 409
+async def _get_own_order(db: AsyncSession, order_id: int, user_id: int):
+    db_order = await crud.get_order(db=db, order_id=order_id, eager=False)
+    if db_order is None:
+        archived = await crud.get_archived_order(db=db, order_id=order_id)
+        if archived is not None and archived.user_id == user_id:
+            raise HTTPException(status_code=409, detail="Archived orders cannot be modified")
+    if db_order is None or db_order.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Order not found or not authorized")
+    return db_order
+
+# Позиции не прошли проверку или на складе не хватило остатка
+def _invalid_items(exc: crud.InvalidOrderItems) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={"message": "Invalid order items", "missing": exc.missing, "out_of_stock": exc.out_of_stock},
+    )
+
+# Создание нового заказа; с заголовком Idempotency-Key повтор запроса возвращает уже созданный заказ
 @router.post("/", response_model=schemas.Order)
-async def create_order(order: schemas.OrderCreate, db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    return await crud.create_order(db=db, order=order, user_id=current_user.id)
+async def create_order(request: Request, order: schemas.OrderCreate, db: AsyncSession = Depends(get_db),
+                       current_user: schemas.User = Depends(get_current_user), key: Optional[str] = Depends(idempotency_key)):
+    async def execute():
+        try:
+            return await crud.create_order(db=db, order=order, user_id=current_user.id)
+        except crud.InvalidOrderItems as exc:
+            raise _invalid_items(exc)
+    return await run_idempotent(request, f"orders:{current_user.id}", key, execute,
+                                lambda db_order: schemas.Order.model_validate(db_order).model_dump_json().encode())
 
 # Обновление существующего заказа
 @router.put("/{order_id}", response_model=schemas.Order)
 async def update_order(order_id: int, order: schemas.OrderCreate, db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    db_order = await crud.get_order(db=db, order_id=order_id)
-    if db_order is None or db_order.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Order not found or not authorized")
-    return await crud.update_order(db=db, order_id=order_id, order=order)
+    await _get_own_order(db, order_id, current_user.id)
+    try:
+        return await crud.update_order(db=db, order_id=order_id, order=order)
+    except crud.InvalidOrderItems as exc:
+        raise _invalid_items(exc)
 
 # Удаление заказа
 @router.delete("/{order_id}", response_model=schemas.Order)
 async def delete_order(order_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
-    db_order = await crud.get_order(db=db, order_id=order_id)
-    if db_order is None or db_order.user_id != current_user.id:
-        raise HTTPException(status_code=404, detail="Order not found or not authorized")
+    await _get_own_order(db, order_id, current_user.id)
     return await crud.delete_order(db=db, order_id=order_id)
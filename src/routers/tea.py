@@ -1,31 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from src import crud, schemas
-from src.databases import AsyncSessionLocal
+from src import crud, schemas, pagination
+from src.databases import UnitOfWorkRoute, get_db, get_read_db
+from src.http_cache import catalog_response
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
-# Асинхронная зависимость для получения сессии базы данных
-async def get_db():
-    async with AsyncSessionLocal() as db:
+# Асинхронное получение списка всех чаев с фильтрами (type, цена, вес, наличие, q) и сортировкой
+# Без cursor — старая offset-пагинация (список); с cursor (пустой для первой страницы) — keyset-страница.
+# Ответ кэшируется готовыми байтами, поддерживаются ETag / If-None-Match (304)
+@router.get("/", response_model=Union[list[schemas.Tea], schemas.TeaPage])
+async def read_teas(request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                    filters: schemas.TeaFilter = Depends(), db: AsyncSession = Depends(get_read_db)):
+    async def produce():
+        if cursor is None:
+            return await crud.get_teas(db, skip=skip, limit=limit, filters=filters)
         try:
-            yield db
-        finally:
-            await db.close()
+            key = pagination.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        # курсор действителен только для той сортировки, с которой он выдан
+        if key and key.get("s", "id") != filters.sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+        teas = await crud.get_teas_keyset(db, after_id=key.get("id"), after_value=key.get("v"), limit=limit, filters=filters)
+        sort_field = filters.sort.lstrip("-")
+        return schemas.TeaPage(
+            items=teas,
+            next_cursor=pagination.next_cursor(teas, limit, lambda tea: {"id": tea.id, "v": getattr(tea, sort_field), "s": filters.sort}),
+        )
+    return await catalog_response(request, produce)
 
-# Асинхронное получение списка всех чаев
-@router.get("/", response_model=list[schemas.Tea])
-async def read_teas(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    teas = await crud.get_teas(db, skip=skip, limit=limit)
-    return teas
+# id для пакетного запроса: без повторов, в исходном порядке, не больше TEA_BATCH_MAX_IDS
+def _batch_ids(ids: list[int]) -> list[int]:
+    unique = list(dict.fromkeys(ids))
+    if not unique:
+        raise HTTPException(status_code=400, detail="No tea ids given")
+    if len(unique) > crud.TEA_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many tea ids (max {crud.TEA_BATCH_MAX_IDS})")
+    return unique
 
-# Асинхронное получение одного чая по ID
+async def _tea_batch(db: AsyncSession, tea_ids: list[int]) -> schemas.TeaBatch:
+    teas = await crud.get_teas_by_ids(db, tea_ids)
+    items = {tea.id: tea for tea in teas}
+    return schemas.TeaBatch(items=items, missing=[tea_id for tea_id in tea_ids if tea_id not in items])
+
+# Пакетное получение чаев (корзина, история заказов): ?ids=1,2,3 или ?ids=1&ids=2 — один запрос к БД
+# вместо запроса на каждый чай; ответ кэшируется с ETag, как и каталог
+@router.get("/batch", response_model=schemas.TeaBatch)
+async def read_tea_batch(request: Request, ids: list[str] = Query(...), db: AsyncSession = Depends(get_read_db)):
+    try:
+        tea_ids = [int(value) for raw in ids for value in raw.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Tea ids must be integers")
+    tea_ids = _batch_ids(tea_ids)
+
+    async def produce():
+        return await _tea_batch(db, tea_ids)
+    return await catalog_response(request, produce)
+
+# То же для длинных списков id в теле запроса
+@router.post("/batch", response_model=schemas.TeaBatch)
+async def read_tea_batch_post(batch: schemas.TeaBatchRequest, db: AsyncSession = Depends(get_read_db)):
+    return await _tea_batch(db, _batch_ids(batch.ids))
+
+# Асинхронное получение одного чая по ID (с ETag, как и список)
 @router.get("/{tea_id}", response_model=schemas.Tea)
-async def read_tea(tea_id: int, db: AsyncSession = Depends(get_db)):
-    tea = await crud.get_tea(db, tea_id=tea_id)
-    if tea is None:
-        raise HTTPException(status_code=404, detail="Tea not found")
-    return tea
+async def read_tea(request: Request, tea_id: int, db: AsyncSession = Depends(get_read_db)):
+    async def produce():
+        tea = await crud.get_tea(db, tea_id=tea_id)
+        if tea is None:
+            raise HTTPException(status_code=404, detail="Tea not found")
+        return tea
+    return await catalog_response(request, produce)
 
 # Асинхронное создание нового чая
 @router.post("/", response_model=schemas.Tea)
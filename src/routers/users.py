@@ -1,26 +1,36 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException,status
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from src import crud, schemas
-from src.databases import get_db
+from src import crud, schemas, pagination
+from src.databases import UnitOfWorkRoute, get_db, get_read_db, get_request_db
+from src.idempotency import idempotency_key, run_idempotent
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from src.auth import create_access_token, verify_password, decode_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from src.auth import create_access_token, verify_password_async, decode_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from src.schemas import User
+from src.shared_cache import PRINCIPAL_CACHE_TTL, shared_cache
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 # Зависимость для проверки токена
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
 
 # Асинхронное получение списка всех пользователей
-@router.get("/", response_model=list[schemas.User])
-async def read_users(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    users = await crud.get_users(db, skip=skip, limit=limit)
-    return users
+# Без cursor — offset-пагинация (список); с cursor — keyset-страница с next_cursor
+@router.get("/", response_model=Union[list[schemas.User], schemas.UserPage])
+async def read_users(skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    if cursor is None:
+        return await crud.get_users(db, skip=skip, limit=limit)
+    try:
+        key = pagination.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    users = await crud.get_users_keyset(db, after_id=key.get("id"), limit=limit)
+    return {"items": users, "next_cursor": pagination.next_cursor(users, limit, lambda user: {"id": user.id})}
 
 # Асинхронное получение одного пользователя по ID
 @router.get("/{user_id}", response_model=schemas.User)
-async def read_user(user_id: int, db: AsyncSession = Depends(get_db)):
+async def read_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     user = await crud.get_user(db, user_id=user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -50,25 +60,41 @@ async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
 
 
 # Получение текущего пользователя на основе токена
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_request_db)):
     user_id = decode_access_token(token)
     if user_id is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    user = await crud.get_user(db, user_id=user_id)
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    # Пользователь берётся из общего короткоживущего кэша, в БД идём только при промахе.
+    # «Не найден» не кэшируется: id может занять новый пользователь, а реплика — отставать
+    async def load():
+        db_user = await crud.get_user(db, user_id=int(user_id))
+        user = schemas.User.model_validate(db_user) if db_user else None
+        # транзакция только читала — соединение возвращается в пул до работы обработчика
+        await db.rollback()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        return user
+
+    user = await shared_cache.get_or_load(
+        f"principal:{int(user_id)}", load, PRINCIPAL_CACHE_TTL,
+        lambda user: user.model_dump_json().encode(), schemas.User.model_validate_json,
+    )
     
     return user
 
 
-# Регистрация нового пользователя
+# Регистрация нового пользователя; с заголовком Idempotency-Key повтор возвращает созданного пользователя
 @router.post("/register", response_model=schemas.User)
-async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
-    db_user = await crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return await crud.create_user(db=db, user=user)
+async def register_user(request: Request, user: schemas.UserCreate, db: AsyncSession = Depends(get_db),
+                        key: Optional[str] = Depends(idempotency_key)):
+    async def execute():
+        db_user = await crud.get_user_by_email(db, email=user.email)
+        if db_user:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        return await crud.create_user(db=db, user=user)
+    return await run_idempotent(request, "register", key, execute,
+                                lambda db_user: schemas.User.model_validate(db_user).model_dump_json().encode())
 
 
 
@@ -77,7 +103,7 @@ async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get
 @router.post("/login", response_model=schemas.Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     user = await crud.get_user_by_email(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,57 @@
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Optional
+from src import models
+
+# Лёгкие строки для списков только на чтение: выбираются лишь колонки схемы ответа,
+# объекты не попадают в identity map сессии и не отслеживаются.
+# Порядок полей совпадает с порядком колонок в select — строка собирается как Row(*row)
+
+@dataclass(slots=True)
+class UserRow:
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    is_admin: bool  # hashed_password сюда не входит и из БД не читается
+
+@dataclass(slots=True)
+class TeaRow:
+    id: int
+    name: str
+    description: Optional[str]
+    price: float
+    type: str
+    weight: float
+    in_stock: bool
+    sku: Optional[str]
+
+@dataclass(slots=True)
+class OrderItemRow:
+    id: int
+    order_id: int
+    tea_id: int
+    quantity: int
+    unit_price: Optional[float]
+    tea: Optional[TeaRow] = None
+
+@dataclass(slots=True)
+class OrderRow:
+    id: int
+    user_id: int
+    created_at: datetime
+    status: Optional[str]
+    total: Optional[float]
+    items: list[OrderItemRow] = field(default_factory=list)
+
+# Колонки таблицы модели в порядке полей строки (вложенные tea и items — не колонки)
+def columns(row_class, model) -> tuple:
+    table_columns = model.__table__.columns
+    return tuple(getattr(model, item.name) for item in fields(row_class) if item.name in table_columns)
+
+USER_COLUMNS = columns(UserRow, models.User)
+TEA_COLUMNS = columns(TeaRow, models.Tea)
+ORDER_COLUMNS = columns(OrderRow, models.Order)
+ORDER_ITEM_COLUMNS = columns(OrderItemRow, models.OrderItem)
+ARCHIVED_ORDER_COLUMNS = columns(OrderRow, models.ArchivedOrder)
+ARCHIVED_ORDER_ITEM_COLUMNS = columns(OrderItemRow, models.ArchivedOrderItem)
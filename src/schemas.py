@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter, field_validator, model_validator
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
 
 # -------- Пользователи (Users) -------- #
 
@@ -16,8 +16,12 @@ class User(UserBase):
     is_active: bool
     is_admin: bool
 
-    class Config:
-        orm_mode = True  # Позволяет использовать ORM объекты напрямую
+    model_config = ConfigDict(from_attributes=True)  # Позволяет использовать ORM объекты напрямую
+
+# Страница пользователей при keyset-пагинации
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None  # None — больше страниц нет
 
 
 # -------- Токены для аутентификации (Tokens) -------- #
@@ -39,15 +43,79 @@ class TeaBase(BaseModel):
     type: str
     weight: float
     in_stock: bool = True
+    sku: Optional[str] = None  # артикул поставщика
+
+    # пустой артикул — это его отсутствие (иначе две такие строки нарушают уникальный индекс ix_tea_sku)
+    @field_validator("sku")
+    @classmethod
+    def blank_sku_is_none(cls, value: Optional[str]) -> Optional[str]:
+        return value if value and value.strip() else None
 
 class TeaCreate(TeaBase):
-    pass  # Используем все поля из базовой схемы
+    stock: Optional[int] = Field(None, ge=0)  # остаток на складе; None — количество не учитывается
+
+    # при заданном остатке наличие определяется им
+    @model_validator(mode="after")
+    def sync_in_stock(self):
+        if self.stock is not None:
+            self.in_stock = self.stock > 0
+        return self
+
+    # Поля для обновления существующего чая. Без stock в запросе учёт остатка не меняется,
+    # а при учитываемом остатке (tracked — stock в БД не NULL) наличие по-прежнему определяется им
+    def update_values(self, tracked: bool) -> dict:
+        values = self.model_dump()
+        if "stock" not in self.model_fields_set:
+            del values["stock"]
+            if tracked:
+                del values["in_stock"]
+        return values
 
 class Tea(TeaBase):
     id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+# Фильтры и сортировка каталога (query-параметры GET /tea/)
+class TeaFilter(BaseModel):
+    type: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_weight: Optional[float] = None
+    max_weight: Optional[float] = None
+    in_stock_only: bool = False
+    q: Optional[str] = None  # поиск по названию
+    match: Literal["prefix", "contains"] = "contains"
+    sort: Literal["id", "-id", "price", "-price", "name", "-name", "weight", "-weight"] = "id"
+
+# Ошибка одной строки массового импорта
+class TeaBulkError(BaseModel):
+    row: int  # номер строки во входных данных (с нуля)
+    error: str
+
+# Итог массового импорта каталога
+class TeaBulkResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[TeaBulkError] = []
+
+# Валидатор списка чаев (компилируется один раз, а не на каждый элемент)
+TeaList = TypeAdapter(List[Tea])
+
+# Страница чаев при keyset-пагинации
+class TeaPage(BaseModel):
+    items: List[Tea]
+    next_cursor: Optional[str] = None
+
+# Запрос пакетного получения чаев (POST /tea/batch)
+class TeaBatchRequest(BaseModel):
+    ids: List[int]
+
+# Чаи по списку id: найденные по id и отсутствующие id
+class TeaBatch(BaseModel):
+    items: Dict[int, Tea]
+    missing: List[int] = []
 
 
 # -------- Позиции заказа (Order Items) -------- #
@@ -57,14 +125,14 @@ class OrderItemBase(BaseModel):
     quantity: int  # Количество товара в заказе
 
 class OrderItemCreate(OrderItemBase):
-    pass  # Используем все поля из базовой схемы
+    quantity: int = Field(gt=0)  # отрицательное количество вернуло бы товар на склад
 
 class OrderItem(OrderItemBase):
     id: int
+    unit_price: Optional[float] = None  # цена на момент заказа
     tea: Optional[Tea]  # Вложенная схема чая для отображения информации о товаре
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # -------- Заказы (Orders) -------- #
@@ -79,7 +147,49 @@ class Order(OrderBase):
     id: int
     user_id: int  # ID пользователя, связанного с заказом
     created_at: datetime  # Время создания заказа
+    total: Optional[float] = None  # сумма заказа по ценам на момент оформления
     items: List[OrderItem]  # Список позиций заказа (вложенные схемы)
 
-    class Config:
-        orm_mode = True  # ORM-режим для взаимодействия с моделями
+    model_config = ConfigDict(from_attributes=True)  # ORM-режим для взаимодействия с моделями
+
+# Валидатор/сериализатор списка заказов (для общего кэша)
+OrderList = TypeAdapter(List[Order])
+
+# Страница заказов при keyset-пагинации
+class OrderPage(BaseModel):
+    items: List[Order]
+    next_cursor: Optional[str] = None
+
+# Выручка по статусу заказа
+class RevenueByStatus(BaseModel):
+    status: Optional[str]
+    orders: int
+    revenue: float
+
+# Отчёт о выручке за период (отменённые заказы в итог не входят)
+class RevenueReport(BaseModel):
+    orders: int
+    revenue: float
+    by_status: List[RevenueByStatus]
+
+
+# -------- Аналитика продаж (Admin Analytics) -------- #
+
+# Продажи чая за период
+class TeaSales(BaseModel):
+    tea_id: int
+    name: Optional[str] = None  # None — чай уже удалён из каталога
+    units: int
+    revenue: float
+
+# Заказы по статусу за день
+class DailyStatusSales(BaseModel):
+    day: date
+    status: str
+    orders: int
+    revenue: float
+
+# Активные покупатели за день
+class DailyBuyers(BaseModel):
+    day: date
+    buyers: int
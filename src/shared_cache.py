@@ -0,0 +1,367 @@
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# memory:// — кэш внутри процесса; redis://host:port/db — общий для всех воркеров
+CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL", "memory://")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "tea-shop")
+# Сколько держится блокировка загрузки и сколько ждать чужую загрузку (single-flight между воркерами)
+CACHE_LOCK_TTL_MS = int(os.getenv("CACHE_LOCK_TTL_MS", "2000"))
+CACHE_LOCK_WAIT_MS = int(os.getenv("CACHE_LOCK_WAIT_MS", "500"))
+# Таймаут одной команды к Redis: медленный кэш не должен тормозить запросы
+CACHE_TIMEOUT_MS = int(os.getenv("CACHE_TIMEOUT_MS", "200"))
+
+# -------- Бэкенды -------- #
+
+# Бэкенд в памяти процесса (по умолчанию и для локальной разработки).
+# Счётчики версий хранятся отдельно от значений и не занимают место в maxsize: их нельзя вытеснять
+# раньше данных (сброс версии в 0 вернул бы старые записи). Счётчик живёт version_ttl с последнего
+# чтения или увеличения — это дольше TTL любой записи, созданной при этой версии
+class MemoryBackend:
+    def __init__(self, maxsize: int = 10000, version_ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.version_ttl = version_ttl
+        self._values: dict[str, tuple[float | None, bytes]] = {}
+        self._counters: dict[str, tuple[float, int]] = {}
+
+    def _counter(self, key: str, now: float) -> int | None:
+        entry = self._counters.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._counters[key]
+            return None
+        self._counters[key] = (now + self.version_ttl, value)
+        return value
+
+    def _alive(self, key: str):
+        now = time.monotonic()
+        counter = self._counter(key, now)
+        if counter is not None:
+            return str(counter).encode()
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= now:
+            del self._values[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> bytes | None:
+        return self._alive(key)
+
+    async def mget(self, *keys: str) -> list[bytes | None]:
+        return [self._alive(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None):
+        self._values.pop(key, None)
+        self._values[key] = (time.monotonic() + ttl if ttl else None, value)
+        if len(self._values) > self.maxsize:
+            self._evict()
+
+    # Сначала выбрасываем истёкшие записи, затем самые старые
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._values.items() if expires_at is not None and expires_at <= now]:
+            del self._values[key]
+        while len(self._values) > self.maxsize:
+            del self._values[next(iter(self._values))]
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self._alive(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._values.pop(key, None)
+            self._counters.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        now = time.monotonic()
+        value = (self._counter(key, now) or 0) + 1
+        self._counters[key] = (now + self.version_ttl, value)
+        # истёкшие счётчики убираются, когда их становится больше maxsize
+        if len(self._counters) > self.maxsize:
+            for stale in [name for name, (expires_at, _) in self._counters.items() if expires_at <= now]:
+                del self._counters[stale]
+        return value
+
+    async def close(self):
+        pass
+
+
+class RedisError(Exception):
+    pass
+
+# Ошибки бэкенда, при которых кэш пропускается и значение берётся из БД
+BACKEND_ERRORS = (OSError, EOFError, asyncio.TimeoutError, RedisError)
+
+def _encode_command(args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b"+":
+        return payload
+    if prefix == b"-":
+        raise RedisError(payload.decode())
+    if prefix == b":":
+        return int(payload)
+    if prefix == b"$":
+        length = int(payload)
+        if length == -1:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if prefix == b"*":
+        length = int(payload)
+        if length == -1:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+# Бэкенд по протоколу Redis (RESP) с небольшим пулом соединений; работает с Redis, KeyDB, Dragonfly
+class RedisBackend:
+    def __init__(self, url: str, pool_size: int = 10):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._opened = 0
+        self._available: asyncio.Condition | None = None
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        for command in ((["AUTH", self.password] if self.password else None), (["SELECT", self.db] if self.db else None)):
+            if command:
+                writer.write(_encode_command(command))
+                await writer.drain()
+                await _read_reply(reader)
+        return reader, writer
+
+    async def _acquire(self):
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            while not self._idle and self._opened >= self.pool_size:
+                await self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            return await self._connect()
+        except Exception:
+            async with self._available:
+                self._opened -= 1
+                self._available.notify()
+            raise
+
+    async def _release(self, connection, broken: bool):
+        async with self._available:
+            if broken:
+                self._opened -= 1
+                connection[1].close()
+            else:
+                self._idle.append(connection)
+            self._available.notify()
+
+    async def _roundtrip(self, connection, args):
+        reader, writer = connection
+        writer.write(_encode_command(args))
+        await writer.drain()
+        return await _read_reply(reader)
+
+    async def execute(self, *args):
+        connection = await self._acquire()
+        broken = True
+        try:
+            reply = await asyncio.wait_for(self._roundtrip(connection, args), CACHE_TIMEOUT_MS / 1000)
+            broken = False
+            return reply
+        except RedisError:
+            broken = False
+            raise
+        finally:
+            await self._release(connection, broken)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.execute("GET", key)
+
+    async def mget(self, *keys: str) -> list[bytes | None]:
+        return await self.execute("MGET", *keys)
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None):
+        if ttl:
+            await self.execute("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            await self.execute("SET", key, value)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self.execute("SET", key, value, "NX", "PX", int(ttl * 1000)) is not None
+
+    async def delete(self, *keys: str):
+        await self.execute("DEL", *keys)
+
+    async def incr(self, key: str) -> int:
+        return await self.execute("INCR", key)
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+        self._opened = 0
+
+def create_backend(url: str):
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryBackend(
+            maxsize=int(os.getenv("CACHE_MEMORY_MAXSIZE", "10000")),
+            version_ttl=float(os.getenv("CACHE_VERSION_TTL", "3600")),
+        )
+    if scheme == "redis":
+        return RedisBackend(url, pool_size=int(os.getenv("CACHE_POOL_SIZE", "10")))
+    raise ValueError(f"Unsupported cache backend: {url}")
+
+# -------- Кэш поверх бэкенда -------- #
+
+# Общий кэш: версионированные ключи для инвалидации и single-flight загрузка при промахе.
+# Ошибки бэкенда не роняют запрос — значение просто грузится из БД
+class SharedCache:
+    def __init__(self, backend, prefix: str = CACHE_KEY_PREFIX):
+        self.backend = backend
+        self.prefix = prefix
+        self._loading: dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    # Текущие версии пространств имён (одним запросом); отсутствующая версия — 0
+    async def versions(self, *names: str) -> list[int]:
+        try:
+            values = await self.backend.mget(*(self._key(f"version:{name}") for name in names))
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+            return [-1] * len(names)
+        return [int(value) if value is not None else 0 for value in values]
+
+    # Увеличение версии делает недоступными все ключи с прежней версией
+    async def bump(self, name: str):
+        try:
+            await self.backend.incr(self._key(f"version:{name}"))
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+
+    async def delete(self, key: str):
+        try:
+            await self.backend.delete(self._key(key))
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+
+    async def _get(self, key: str):
+        try:
+            return await self.backend.get(key)
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+            return None
+
+    # Простые операции с байтами по ключу (для своих протоколов поверх кэша, например идемпотентности)
+    async def get(self, key: str) -> bytes | None:
+        return await self._get(self._key(key))
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        try:
+            await self.backend.set(self._key(key), value, ttl)
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+
+    # SET NX; при недоступном бэкенде считаем ключ занятым нами, чтобы запрос не блокировался
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        try:
+            return await self.backend.add(self._key(key), value, ttl)
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+            return True
+
+    async def get_or_load(self, key: str, loader, ttl: float, dumps, loads):
+        full_key = self._key(key)
+        raw = await self._get(full_key)
+        if raw is not None:
+            self.hits += 1
+            return loads(raw)
+        lock = self._loading.setdefault(full_key, asyncio.Lock())
+        try:
+            # внутри процесса одновременные промахи ждут одну загрузку
+            async with lock:
+                raw = await self._get(full_key)
+                if raw is not None:
+                    self.hits += 1
+                    return loads(raw)
+                self.misses += 1
+                return await self._load_once(full_key, loader, ttl, dumps, loads)
+        finally:
+            if not lock.locked():
+                self._loading.pop(full_key, None)
+
+    # Между воркерами: грузит тот, кто взял блокировку (SET NX), остальные недолго ждут результат
+    async def _load_once(self, full_key: str, loader, ttl: float, dumps, loads):
+        lock_key = f"{full_key}:lock"
+        try:
+            owner = await self.backend.add(lock_key, b"1", CACHE_LOCK_TTL_MS / 1000)
+        except BACKEND_ERRORS as exc:
+            self._backend_failed(exc)
+            return await loader()
+        if not owner:
+            deadline = time.monotonic() + CACHE_LOCK_WAIT_MS / 1000
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.02)
+                raw = await self._get(full_key)
+                if raw is not None:
+                    return loads(raw)
+            return await loader()
+        try:
+            value = await loader()
+            try:
+                await self.backend.set(full_key, dumps(value), ttl)
+            except BACKEND_ERRORS as exc:
+                self._backend_failed(exc)
+            return value
+        finally:
+            try:
+                await self.backend.delete(lock_key)
+            except BACKEND_ERRORS:
+                pass
+
+    def _backend_failed(self, exc: Exception):
+        self.errors += 1
+        logger.warning("cache backend error: %s", exc)
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+# Время жизни записей общего кэша (секунды)
+TEA_CACHE_TTL = float(os.getenv("TEA_CACHE_TTL", "300"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+ORDERS_CACHE_TTL = float(os.getenv("ORDERS_CACHE_TTL", "30"))
+
+shared_cache = SharedCache(create_backend(CACHE_BACKEND_URL))